@@ -1,47 +1,43 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from sqlalchemy.orm import Session
+from sqlalchemy import case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 import shutil
 import os
 
 from . import models
 from .auth import get_current_active_user
-from .database import get_db
+from .database import get_async_db, get_read_db
+from .instrumentation import query_budget
+from .queries import conversation_page, conversation_to_dict
 from .schemas import AlumniCreate, AlumniUpdate
 
 router = APIRouter(prefix="/alumni", tags=["alumni"])
 
 @router.get("/dashboard")
+@query_budget(4)
 async def get_alumni_dashboard(
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     if current_user.role != "alumni":
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    alumni = db.query(models.Alumni).filter(models.Alumni.user_id == current_user.id).first()
+    alumni = await db.scalar(select(models.Alumni).where(models.Alumni.user_id == current_user.id))
     if not alumni:
         raise HTTPException(status_code=404, detail="Alumni profile not found")
     
-    # Get recent conversations
-    conversations = db.query(models.ChatConversation).filter(
-        (models.ChatConversation.user1_id == current_user.id) | 
-        (models.ChatConversation.user2_id == current_user.id)
-    ).order_by(models.ChatConversation.last_message_time.desc()).limit(10).all()
+    # Recent conversations with the other participant, in one query
+    conversations = await conversation_page(db, current_user.id, 10)
     
     # Get unread message count
-    unread_count = db.query(models.ChatMessage).filter(
-        models.ChatMessage.receiver_id == current_user.id,
-        models.ChatMessage.is_read == False
-    ).count()
+    unread_count = current_user.unread_messages
     
     # Get total connections (unique people chatted with)
-    connections = set()
-    for conv in conversations:
-        if conv.user1_id == current_user.id:
-            connections.add(conv.user2_id)
-        else:
-            connections.add(conv.user1_id)
+    conversation = models.ChatConversation
+    connections_count = await db.scalar(select(func.count(func.distinct(case(
+        (conversation.user1_id == current_user.id, conversation.user2_id), else_=conversation.user1_id
+    )))).where((conversation.user1_id == current_user.id) | (conversation.user2_id == current_user.id)))
     
     return {
         "alumni": {
@@ -64,32 +60,19 @@ async def get_alumni_dashboard(
             }
         },
         "unread_messages": unread_count,
-        "connections_count": len(connections),
-        "recent_conversations": [
-            {
-                "id": conv.id,
-                "other_user": {
-                    "id": conv.user2_id if conv.user1_id == current_user.id else conv.user1_id,
-                    "full_name": (conv.user2 if conv.user1_id == current_user.id else conv.user1).full_name,
-                    "role": (conv.user2 if conv.user1_id == current_user.id else conv.user1).role,
-                    "username": (conv.user2 if conv.user1_id == current_user.id else conv.user1).username
-                },
-                "last_message": conv.last_message,
-                "last_message_time": conv.last_message_time
-            }
-            for conv in conversations
-        ]
+        "connections_count": connections_count,
+        "recent_conversations": [conversation_to_dict(*row) for row in conversations]
     }
 
 @router.get("/profile")
 async def get_alumni_profile(
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     if current_user.role != "alumni":
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    alumni = db.query(models.Alumni).filter(models.Alumni.user_id == current_user.id).first()
+    alumni = await db.scalar(select(models.Alumni).where(models.Alumni.user_id == current_user.id))
     if not alumni:
         raise HTTPException(status_code=404, detail="Alumni profile not found")
     
@@ -118,12 +101,12 @@ async def get_alumni_profile(
 async def update_alumni_profile(
     alumni_data: AlumniUpdate,
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     if current_user.role != "alumni":
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    alumni = db.query(models.Alumni).filter(models.Alumni.user_id == current_user.id).first()
+    alumni = await db.scalar(select(models.Alumni).where(models.Alumni.user_id == current_user.id))
     if not alumni:
         raise HTTPException(status_code=404, detail="Alumni profile not found")
     
@@ -131,8 +114,8 @@ async def update_alumni_profile(
     for field, value in alumni_data.dict(exclude_unset=True).items():
         setattr(alumni, field, value)
     
-    db.commit()
-    db.refresh(alumni)
+    await db.commit()
+    await db.refresh(alumni)
     
     return {"message": "Profile updated successfully", "alumni": alumni}
 
@@ -140,7 +123,7 @@ async def update_alumni_profile(
 async def upload_profile_picture(
     file: UploadFile = File(...),
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     if current_user.role != "alumni":
         raise HTTPException(status_code=403, detail="Not authorized")
@@ -157,22 +140,22 @@ async def upload_profile_picture(
         shutil.copyfileobj(file.file, buffer)
     
     # Update alumni profile
-    alumni = db.query(models.Alumni).filter(models.Alumni.user_id == current_user.id).first()
+    alumni = await db.scalar(select(models.Alumni).where(models.Alumni.user_id == current_user.id))
     if alumni:
         alumni.profile_picture = file_path
-        db.commit()
+        await db.commit()
     
     return {"message": "Profile picture uploaded", "file_path": file_path}
 
 @router.get("/students")
 async def get_all_students(
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     if current_user.role != "alumni":
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    students = db.query(models.User).filter(models.User.role == "student").all()
+    students = (await db.scalars(select(models.User).where(models.User.role == "student"))).all()
     return [
         {
             "id": student.id,
@@ -187,12 +170,12 @@ async def get_all_students(
 @router.get("/teachers")
 async def get_all_teachers(
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     if current_user.role != "alumni":
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    teachers = db.query(models.User).filter(models.User.role == "teacher").all()
+    teachers = (await db.scalars(select(models.User).where(models.User.role == "teacher"))).all()
     return [
         {
             "id": teacher.id,
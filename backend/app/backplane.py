@@ -0,0 +1,233 @@
+import asyncio
+import json
+import os
+from urllib.parse import urlparse
+
+# Where chat events (and worker-wide broadcasts such as prediction cache invalidations)
+# fan out between workers and hosts. Empty keeps delivery in-process (one worker only);
+# redis://[:password@]host:6379 or unix:///path/to.sock use Redis pub/sub, or
+# pubsub_broker.py as a local stand-in.
+CHAT_BACKPLANE_URL = os.environ.get("CHAT_BACKPLANE_URL", "")
+CHAT_CHANNEL_PREFIX = os.environ.get("CHAT_CHANNEL_PREFIX", "eduhub:chat:user:")
+# Channel every worker subscribes to for broadcast(); outside CHAT_CHANNEL_PREFIX
+BROADCAST_CHANNEL = os.environ.get("CHAT_BROADCAST_CHANNEL", "eduhub:broadcast")
+# Seconds subscribe() waits for the broker to confirm before giving up on it
+BACKPLANE_TIMEOUT = float(os.environ.get("CHAT_BACKPLANE_TIMEOUT", "5"))
+BACKPLANE_RECONNECT_SECONDS = 1.0
+
+
+# ------------------ REDIS PROTOCOL (RESP2) ------------------
+
+def encode(*items):
+    """A RESP array of bulk strings (str/bytes) and integers"""
+    out = [b"*%d\r\n" % len(items)]
+    for item in items:
+        if isinstance(item, int):
+            out.append(b":%d\r\n" % item)
+        else:
+            data = item if isinstance(item, bytes) else str(item).encode()
+            out.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(out)
+
+
+class BackplaneError(Exception):
+    pass
+
+
+async def read_reply(reader):
+    """Read one RESP value; bulk strings come back as bytes"""
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("backplane connection closed")
+    kind, rest = line[:1], line[1:].rstrip(b"\r\n")
+    if kind == b"+":
+        return rest.decode()
+    if kind == b"-":
+        raise BackplaneError(rest.decode())
+    if kind == b":":
+        return int(rest)
+    if kind == b"$":
+        length = int(rest)
+        return None if length < 0 else (await reader.readexactly(length + 2))[:-2]
+    if kind == b"*":
+        length = int(rest)
+        return None if length < 0 else [await read_reply(reader) for _ in range(length)]
+    raise ConnectionError(f"unexpected backplane reply {line!r}")
+
+
+# ------------------ BACKPLANES ------------------
+# publish(user_id, event) reaches the worker(s) that subscribed to that user, which
+# hand it to the ``deliver(user_id, event)`` coroutine given to start().
+# broadcast(event) reaches every other worker's ``on_broadcast(event)`` callback.
+
+class InMemoryBackplane:
+    """Single-process backplane: publish delivers straight to this worker's sockets"""
+
+    def __init__(self):
+        self._deliver = None
+
+    async def start(self, deliver, on_broadcast=None):
+        self._deliver = deliver
+
+    async def subscribe(self, user_id):
+        pass
+
+    async def unsubscribe(self, user_id):
+        pass
+
+    async def publish(self, user_id, event):
+        if self._deliver is not None:
+            await self._deliver(user_id, event)
+
+    async def broadcast(self, event):
+        pass  # there are no other workers
+
+    async def close(self):
+        self._deliver = None
+
+
+class RedisBackplane:
+    """Redis pub/sub with one channel per user. Each worker subscribes only to the users
+    connected to it, so adding workers or hosts doesn't multiply the traffic each one sees.
+
+    Uses two connections: a subscriber (reconnects and re-subscribes on failure) and a
+    publisher.
+    """
+
+    def __init__(self, url, prefix=CHAT_CHANNEL_PREFIX, timeout=BACKPLANE_TIMEOUT,
+                 broadcast_channel=BROADCAST_CHANNEL):
+        self.url = url
+        self.prefix = prefix
+        self.timeout = timeout
+        self.broadcast_channel = broadcast_channel
+        self._channels = set()
+        self._confirmations = {}
+        self._deliver = None
+        self._on_broadcast = None
+        self._listener = None
+        self._subscriber = None
+        self._publisher = None
+        self._publish_lock = asyncio.Lock()
+
+    def _channel(self, user_id):
+        return f"{self.prefix}{user_id}"
+
+    async def _connect(self):
+        parsed = urlparse(self.url)
+        if parsed.scheme == "unix":
+            reader, writer = await asyncio.open_unix_connection(parsed.path)
+        else:
+            reader, writer = await asyncio.open_connection(parsed.hostname or "localhost", parsed.port or 6379)
+        if parsed.password:
+            writer.write(encode("AUTH", parsed.password))
+            await writer.drain()
+            await read_reply(reader)
+        return reader, writer
+
+    async def start(self, deliver, on_broadcast=None):
+        self._deliver = deliver
+        self._on_broadcast = on_broadcast
+        if on_broadcast is not None:
+            # Subscribed with the user channels once the listener connects
+            self._channels.add(self.broadcast_channel)
+        self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self):
+        while True:
+            try:
+                reader, writer = await self._connect()
+                # No await between taking the writer and re-subscribing, so a concurrent
+                # subscribe() either lands in the snapshot or writes its own SUBSCRIBE
+                self._subscriber = writer
+                if self._channels:
+                    writer.write(encode("SUBSCRIBE", *self._channels))
+                await writer.drain()
+                while True:
+                    reply = await read_reply(reader)
+                    if not isinstance(reply, list) or not reply:
+                        continue
+                    kind = reply[0]
+                    if kind == b"message":
+                        await self._dispatch(reply[1].decode(), reply[2])
+                    elif kind == b"subscribe":
+                        confirmed = self._confirmations.pop(reply[1].decode(), None)
+                        if confirmed is not None and not confirmed.done():
+                            confirmed.set_result(True)
+            except asyncio.CancelledError:
+                raise
+            except (OSError, ConnectionError, asyncio.IncompleteReadError, BackplaneError) as e:
+                print(f"⚠️ Chat backplane subscriber disconnected ({e}); reconnecting")
+            self._subscriber = None
+            await asyncio.sleep(BACKPLANE_RECONNECT_SECONDS)
+
+    async def _dispatch(self, channel, payload):
+        try:
+            if channel == self.broadcast_channel:
+                self._on_broadcast(json.loads(payload))
+                return
+            await self._deliver(int(channel[len(self.prefix):]), json.loads(payload))
+        except Exception as e:
+            print(f"⚠️ Chat backplane delivery on {channel} failed: {e}")
+
+    async def subscribe(self, user_id):
+        channel = self._channel(user_id)
+        if channel in self._channels:
+            return
+        self._channels.add(channel)
+        if self._subscriber is None:
+            return  # the listener subscribes to everything in _channels once connected
+        confirmed = self._confirmations.setdefault(channel, asyncio.get_running_loop().create_future())
+        self._subscriber.write(encode("SUBSCRIBE", channel))
+        try:
+            await asyncio.wait_for(asyncio.shield(confirmed), self.timeout)
+        except asyncio.TimeoutError:
+            print(f"⚠️ Chat backplane did not confirm the subscription to {channel}")
+
+    async def unsubscribe(self, user_id):
+        channel = self._channel(user_id)
+        self._channels.discard(channel)
+        if self._subscriber is not None:
+            self._subscriber.write(encode("UNSUBSCRIBE", channel))
+
+    async def publish(self, user_id, event):
+        """Returns how many workers received the event (0 if the user isn't connected anywhere)"""
+        return await self._publish(self._channel(user_id), event)
+
+    async def broadcast(self, event):
+        """Send an event to every worker that started with ``on_broadcast`` (this one included)"""
+        return await self._publish(self.broadcast_channel, event)
+
+    async def _publish(self, channel, event):
+        payload = json.dumps(event, default=str)
+        async with self._publish_lock:
+            for attempt in range(2):
+                try:
+                    if self._publisher is None:
+                        self._publisher = await self._connect()
+                    reader, writer = self._publisher
+                    writer.write(encode("PUBLISH", channel, payload))
+                    await writer.drain()
+                    return await read_reply(reader)
+                except (OSError, ConnectionError, asyncio.IncompleteReadError) as e:
+                    self._publisher = None
+                    if attempt:
+                        # Chat messages are already stored; the receiver sees them on the next load
+                        print(f"⚠️ Chat backplane publish to {channel} failed: {e}")
+        return 0
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+        for connection in (self._subscriber, self._publisher and self._publisher[1]):
+            if connection is not None:
+                connection.close()
+        self._subscriber = self._publisher = None
+
+
+def build_backplane(url=CHAT_BACKPLANE_URL):
+    if not url:
+        return InMemoryBackplane()
+    if urlparse(url).scheme not in ("redis", "unix"):
+        raise ValueError(f"Unsupported CHAT_BACKPLANE_URL {url!r} (expected redis:// or unix://)")
+    return RedisBackplane(url)
@@ -0,0 +1,137 @@
+import csv
+import io
+import os
+
+from sqlalchemy import exists, insert, literal, or_, select
+
+from . import models
+from .counters import COURSE_COUNTERS, add_course_counts
+from .database import upsert_insert
+from .features import refresh_enrollment_features
+
+# Largest roster accepted by one bulk request
+MAX_BULK_ROWS = int(os.environ.get("MAX_BULK_ROWS", "5000"))
+
+# Header cells skipped when they appear in the first row of a roster CSV
+_ROSTER_HEADERS = {"username", "email", "student", "identifier"}
+
+
+def parse_roster_csv(text):
+    """Usernames/emails from the first column of a roster CSV (optional header row)"""
+    identifiers = []
+    for position, row in enumerate(csv.reader(io.StringIO(text))):
+        cell = row[0].strip() if row else ""
+        if not cell or (position == 0 and cell.lower() in _ROSTER_HEADERS):
+            continue
+        identifiers.append(cell)
+    return identifiers
+
+
+def _resolve_students(db, student_ids, identifiers):
+    """{input: student id} for the inputs that match a student, one query per input kind"""
+    resolved = {}
+    if student_ids:
+        for student_id in db.execute(
+            select(models.Student.id).where(models.Student.id.in_(set(student_ids)))
+        ).scalars():
+            resolved[student_id] = student_id
+    if identifiers:
+        rows = db.execute(
+            select(models.Student.id, models.User.username, models.User.email)
+            .join(models.User, models.User.id == models.Student.user_id)
+            .where(or_(models.User.username.in_(set(identifiers)), models.User.email.in_(set(identifiers))))
+        ).all()
+        for student_id, username, email in rows:
+            resolved[username] = student_id
+            resolved[email] = student_id
+    return resolved
+
+
+def bulk_enroll(db, course_id, student_ids=(), identifiers=()):
+    """Enroll students by id and/or username/email; returns one outcome dict per input, in order.
+
+    Outcomes are "enrolled", "already_enrolled", "not_found" or "duplicate" (the
+    same student appeared earlier in the input). Existing enrollments are skipped
+    by the INSERT ... SELECT itself, so the whole roster is one statement. The
+    caller commits.
+    """
+    inputs = list(student_ids) + list(identifiers)
+    resolved = _resolve_students(db, student_ids, identifiers)
+
+    new_ids = {}
+    candidates = set(resolved.values())
+    if candidates:
+        not_enrolled = select(models.Student.id, literal(course_id)).where(
+            models.Student.id.in_(candidates),
+            ~exists().where(
+                models.Enrollment.course_id == course_id,
+                models.Enrollment.student_id == models.Student.id
+            )
+        )
+        new_ids = dict(db.execute(
+            insert(models.Enrollment)
+            .from_select(["student_id", "course_id"], not_enrolled)
+            .returning(models.Enrollment.student_id, models.Enrollment.id)
+        ).all())
+        # Core inserts skip the flush hooks that maintain the course counters
+        add_course_counts(db, {(course_id, COURSE_COUNTERS[models.Enrollment]): len(new_ids)})
+
+    results = []
+    seen = set()
+    for value in inputs:
+        student_id = resolved.get(value)
+        result = {"input": value, "student_id": student_id}
+        if student_id is None:
+            result["status"] = "not_found"
+        elif student_id in seen:
+            result["status"] = "duplicate"
+        elif student_id in new_ids:
+            result["status"] = "enrolled"
+            result["enrollment_id"] = new_ids[student_id]
+        else:
+            result["status"] = "already_enrolled"
+        if student_id is not None:
+            seen.add(student_id)
+        results.append(result)
+    return results
+
+
+def record_attendance(db, course_id, session_date, records):
+    """Upsert one session's attendance for a course; ``records`` are (student_id, status) pairs.
+
+    Returns one outcome dict per record: "recorded", or "not_enrolled" when the
+    student isn't in the course. Rows are keyed on (enrollment_id, date), so
+    re-submitting a corrected sheet overwrites the statuses in a single
+    executemany. The caller commits.
+    """
+    student_ids = {student_id for student_id, _ in records}
+    enrollments = dict(db.execute(
+        select(models.Enrollment.student_id, models.Enrollment.id).where(
+            models.Enrollment.course_id == course_id,
+            models.Enrollment.student_id.in_(student_ids)
+        )
+    ).all()) if student_ids else {}
+
+    # A student listed twice keeps the last status, as a re-submission would
+    rows = {
+        enrollments[student_id]: {"enrollment_id": enrollments[student_id], "date": session_date, "status": status}
+        for student_id, status in records if student_id in enrollments
+    }
+    if rows:
+        upsert = upsert_insert(db, models.Attendance)
+        db.execute(upsert.on_conflict_do_update(
+            index_elements=[models.Attendance.enrollment_id, models.Attendance.date],
+            set_={"status": upsert.excluded.status}
+        ), list(rows.values()))
+        # Core writes skip the flush hooks: refresh the features here and queue the
+        # prediction cache invalidations that prediction_cache applies on commit
+        refresh_enrollment_features(db, rows)
+        db.info.setdefault("prediction_invalidations", set()).update(
+            (student_id, course_id) for student_id in enrollments
+        )
+
+    return [
+        {"student_id": student_id, "attendance": status,
+         "status": "recorded" if student_id in enrollments else "not_enrolled"}
+        for student_id, status in records
+    ]
@@ -1,80 +1,63 @@
 from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, Query
-from sqlalchemy.orm import Session
-from typing import List, Dict
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Dict, Optional
 from datetime import datetime
+import asyncio
 import json
+import os
 
 from . import models
 from .auth import get_current_active_user
-from .database import get_db
+from .backplane import build_backplane
+from .chat_writer import chat_writer
+from .connections import ConnectionManager
+from .database import get_async_db, get_read_db
+from .instrumentation import query_budget
+from .counters import mark_conversation_read
+from .queries import conversation_page, conversation_to_dict
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
-# WebSocket connection manager
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[int, WebSocket] = {}
-    
-    async def connect(self, user_id: int, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections[user_id] = websocket
-    
-    def disconnect(self, user_id: int):
-        if user_id in self.active_connections:
-            del self.active_connections[user_id]
-    
-    async def send_message(self, user_id: int, message: dict):
-        if user_id in self.active_connections:
-            await self.active_connections[user_id].send_json(message)
+# Messages per page of GET /messages/{other_user_id}
+MESSAGE_PAGE_SIZE = int(os.environ.get("CHAT_MESSAGE_PAGE_SIZE", "50"))
+MAX_MESSAGE_PAGE_SIZE = 200
+# Conversations per page of GET /conversations
+CONVERSATION_PAGE_SIZE = int(os.environ.get("CHAT_CONVERSATION_PAGE_SIZE", "100"))
+MAX_CONVERSATION_PAGE_SIZE = 2000
 
-manager = ConnectionManager()
+# Store socket messages through the group-commit writer (chat_writer.py) instead of
+# one transaction per message
+CHAT_GROUP_COMMIT = os.environ.get("CHAT_GROUP_COMMIT", "1") == "1"
+
+# WebSocket connections of this worker
+manager = ConnectionManager(build_backplane())
+# Delivery tasks waiting for their message's batch to commit
+_pending_deliveries = set()
 
 
 @router.get("/conversations")
+@query_budget(2)
 async def get_conversations(
+    limit: int = Query(CONVERSATION_PAGE_SIZE, ge=1, le=MAX_CONVERSATION_PAGE_SIZE),
+    before_time: Optional[datetime] = Query(None, description="last_message_time of the previous page's last item"),
+    before_id: Optional[int] = Query(None, description="id of the previous page's last item"),
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    conversations = db.query(models.ChatConversation).filter(
-        (models.ChatConversation.user1_id == current_user.id) | 
-        (models.ChatConversation.user2_id == current_user.id)
-    ).order_by(models.ChatConversation.last_message_time.desc()).all()
-    
-    result = []
-    for conv in conversations:
-        other_user_id = conv.user2_id if conv.user1_id == current_user.id else conv.user1_id
-        other_user = db.query(models.User).filter(models.User.id == other_user_id).first()
-        
-        unread_count = db.query(models.ChatMessage).filter(
-            models.ChatMessage.conversation_id == conv.id,
-            models.ChatMessage.receiver_id == current_user.id,
-            models.ChatMessage.is_read == False
-        ).count()
-        
-        result.append({
-            "id": conv.id,
-            "other_user": {
-                "id": other_user.id,
-                "full_name": other_user.full_name,
-                "username": other_user.username,
-                "role": other_user.role
-            },
-            "last_message": conv.last_message,
-            "last_message_time": conv.last_message_time,
-            "unread_count": unread_count
-        })
-    
-    return result
+    # Conversation, other participant and the maintained unread counter in one query
+    rows = await conversation_page(db, current_user.id, limit, before_time, before_id)
+    return [conversation_to_dict(*row) for row in rows]
 
 
 # ✅ NEW ENDPOINT: GET ALL ALUMNI
 @router.get("/alumni")
 async def get_all_alumni(
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get all alumni users for chatting"""
-    alumni_users = db.query(models.User).filter(models.User.role == "alumni").all()
+    alumni_users = (await db.scalars(select(models.User).where(models.User.role == "alumni"))).all()
     
     if current_user.role == "alumni":
         alumni_users = [u for u in alumni_users if u.id != current_user.id]
@@ -95,13 +78,13 @@ async def get_all_alumni(
 @router.get("/students")
 async def get_all_students_for_chat(
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get all students for teachers/alumni to chat with"""
     if current_user.role not in ["teacher", "alumni"]:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    students = db.query(models.User).filter(models.User.role == "student").all()
+    students = (await db.scalars(select(models.User).where(models.User.role == "student"))).all()
     
     return [
         {
@@ -116,15 +99,24 @@ async def get_all_students_for_chat(
 
 
 @router.get("/messages/{other_user_id}")
+@query_budget(8)
 async def get_messages(
     other_user_id: int,
+    before_id: Optional[int] = Query(None, description="Page of messages older than this id"),
+    after_id: Optional[int] = Query(None, description="Messages newer than this id (catching up)"),
+    limit: int = Query(MESSAGE_PAGE_SIZE, ge=1, le=MAX_MESSAGE_PAGE_SIZE),
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    conversation = db.query(models.ChatConversation).filter(
+    """One page of a conversation, oldest first. Without cursors it is the latest ``limit``
+    messages; ``next_before_id`` (None at the start of the history) fetches the page before."""
+    if before_id is not None and after_id is not None:
+        raise HTTPException(status_code=400, detail="Use either before_id or after_id")
+
+    conversation = await db.scalar(select(models.ChatConversation).where(
         (models.ChatConversation.user1_id == current_user.id) & (models.ChatConversation.user2_id == other_user_id) |
         (models.ChatConversation.user1_id == other_user_id) & (models.ChatConversation.user2_id == current_user.id)
-    ).first()
+    ))
     
     if not conversation:
         conversation = models.ChatConversation(
@@ -132,19 +124,29 @@ async def get_messages(
             user2_id=other_user_id
         )
         db.add(conversation)
-        db.commit()
-        db.refresh(conversation)
+        await db.commit()
+        await db.refresh(conversation)
     
-    messages = db.query(models.ChatMessage).filter(
-        models.ChatMessage.conversation_id == conversation.id
-    ).order_by(models.ChatMessage.created_at).all()
+    # Keyset pages on (conversation_id, id); one extra row tells whether more remain
+    query = select(models.ChatMessage).where(models.ChatMessage.conversation_id == conversation.id)
+    if after_id is not None:
+        query = query.where(models.ChatMessage.id > after_id).order_by(models.ChatMessage.id)
+    else:
+        if before_id is not None:
+            query = query.where(models.ChatMessage.id < before_id)
+        query = query.order_by(models.ChatMessage.id.desc())
+    messages = (await db.scalars(query.limit(limit + 1))).all()
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    if after_id is None:
+        messages.reverse()
     
-    db.query(models.ChatMessage).filter(
-        models.ChatMessage.conversation_id == conversation.id,
-        models.ChatMessage.receiver_id == current_user.id,
-        models.ChatMessage.is_read == False
-    ).update({"is_read": True})
-    db.commit()
+    # Everything up to the newest message shown (older pages included, like a read
+    # cursor), and only if something is unread at all
+    unread = conversation.user1_unread if conversation.user1_id == current_user.id else conversation.user2_unread
+    if unread and messages:
+        await db.run_sync(mark_conversation_read, conversation.id, current_user.id, messages[-1].id)
+        await db.commit()
     
     return {
         "conversation_id": conversation.id,
@@ -158,7 +160,9 @@ async def get_messages(
                 "is_read": msg.is_read
             }
             for msg in messages
-        ]
+        ],
+        "has_more": has_more,
+        "next_before_id": messages[0].id if messages and has_more and after_id is None else None
     }
 
 
@@ -167,12 +171,12 @@ async def send_message(
     receiver_id: int,
     message: str,
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    conversation = db.query(models.ChatConversation).filter(
+    conversation = await db.scalar(select(models.ChatConversation).where(
         ((models.ChatConversation.user1_id == current_user.id) & (models.ChatConversation.user2_id == receiver_id)) |
         ((models.ChatConversation.user1_id == receiver_id) & (models.ChatConversation.user2_id == current_user.id))
-    ).first()
+    ))
     
     if not conversation:
         conversation = models.ChatConversation(
@@ -180,8 +184,8 @@ async def send_message(
             user2_id=max(current_user.id, receiver_id)
         )
         db.add(conversation)
-        db.commit()
-        db.refresh(conversation)
+        await db.commit()
+        await db.refresh(conversation)
     
     chat_message = models.ChatMessage(
         conversation_id=conversation.id,
@@ -194,8 +198,8 @@ async def send_message(
     conversation.last_message = message[:100]
     conversation.last_message_time = datetime.utcnow()
     
-    db.commit()
-    db.refresh(chat_message)
+    await db.commit()
+    await db.refresh(chat_message)
     
     await manager.send_message(receiver_id, {
         "type": "new_message",
@@ -221,22 +225,83 @@ async def send_message(
 
 @router.get("/unread-count")
 async def get_unread_count(
-    current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: models.User = Depends(get_current_active_user)
 ):
-    count = db.query(models.ChatMessage).filter(
-        models.ChatMessage.receiver_id == current_user.id,
-        models.ChatMessage.is_read == False
-    ).count()
-    return {"unread_count": count}
+    # Maintained counter on the user row that authentication already loaded
+    return {"unread_count": current_user.unread_messages}
+
+
+async def _store_message(sender_id, receiver_id, message_text, client):
+    """Store one message in its own transaction (CHAT_GROUP_COMMIT=0)"""
+    from .database import AsyncSessionLocal
+    
+    # Short-lived session per message, so idle sockets don't hold pooled connections
+    async with AsyncSessionLocal(info={"client": client}) as db:
+        conversation = await db.scalar(select(models.ChatConversation).where(
+            ((models.ChatConversation.user1_id == sender_id) & (models.ChatConversation.user2_id == receiver_id)) |
+            ((models.ChatConversation.user1_id == receiver_id) & (models.ChatConversation.user2_id == sender_id))
+        ))
+        
+        if not conversation:
+            conversation = models.ChatConversation(
+                user1_id=min(sender_id, receiver_id),
+                user2_id=max(sender_id, receiver_id)
+            )
+            db.add(conversation)
+            await db.commit()
+            await db.refresh(conversation)
+        
+        chat_message = models.ChatMessage(
+            conversation_id=conversation.id,
+            sender_id=sender_id,
+            receiver_id=receiver_id,
+            message=message_text
+        )
+        db.add(chat_message)
+        
+        conversation.last_message = message_text[:100]
+        conversation.last_message_time = datetime.utcnow()
+        
+        await db.commit()
+        await db.refresh(chat_message)
+    
+    return {"id": chat_message.id, "conversation_id": conversation.id, "created_at": chat_message.created_at}
+
+
+async def _deliver_stored(connection, user, receiver_id, message_text, stored):
+    await manager.send_message(receiver_id, {
+        "type": "message",
+        "id": stored["id"],
+        "sender_id": user.id,
+        "sender_name": user.full_name,
+        "sender_role": user.role,
+        "message": message_text,
+        "created_at": str(stored["created_at"])
+    })
+    
+    connection.send({
+        "type": "sent",
+        "id": stored["id"],
+        "created_at": str(stored["created_at"])
+    })
+
+
+async def _deliver_when_stored(connection, user, receiver_id, message_text, stored):
+    try:
+        result = await stored
+    except Exception as e:
+        print(f"⚠️ Chat message from user {user.id} was not stored: {e}")
+        connection.send({"type": "error", "message": message_text, "detail": "Message could not be saved"})
+        return
+    await _deliver_stored(connection, user, receiver_id, message_text, result)
 
 
 @router.websocket("/ws/{token}")
 async def websocket_endpoint(websocket: WebSocket, token: str):
-    from .auth import get_current_user
-    from .database import SessionLocal
+    from .database import AsyncSessionLocal
+    
+    connection = None
     
-    db = SessionLocal()
     try:
         from jose import jwt
         from .auth import SECRET_KEY, ALGORITHM
@@ -247,12 +312,13 @@ async def websocket_endpoint(websocket: WebSocket, token: str):
             await websocket.close(code=1008)
             return
         
-        user = db.query(models.User).filter(models.User.username == username).first()
+        async with AsyncSessionLocal() as db:
+            user = await db.scalar(select(models.User).where(models.User.username == username))
         if not user:
             await websocket.close(code=1008)
             return
         
-        await manager.connect(user.id, websocket)
+        connection = await manager.connect(user.id, websocket)
         
         while True:
             data = await websocket.receive_text()
@@ -262,52 +328,21 @@ async def websocket_endpoint(websocket: WebSocket, token: str):
                 receiver_id = message_data.get("receiver_id")
                 message_text = message_data.get("message")
                 
-                conversation = db.query(models.ChatConversation).filter(
-                    ((models.ChatConversation.user1_id == user.id) & (models.ChatConversation.user2_id == receiver_id)) |
-                    ((models.ChatConversation.user1_id == receiver_id) & (models.ChatConversation.user2_id == user.id))
-                ).first()
-                
-                if not conversation:
-                    conversation = models.ChatConversation(
-                        user1_id=min(user.id, receiver_id),
-                        user2_id=max(user.id, receiver_id)
-                    )
-                    db.add(conversation)
-                    db.commit()
-                    db.refresh(conversation)
-                
-                chat_message = models.ChatMessage(
-                    conversation_id=conversation.id,
-                    sender_id=user.id,
-                    receiver_id=receiver_id,
-                    message=message_text
-                )
-                db.add(chat_message)
-                
-                conversation.last_message = message_text[:100]
-                conversation.last_message_time = datetime.utcnow()
-                
-                db.commit()
-                
-                await manager.send_message(receiver_id, {
-                    "type": "message",
-                    "id": chat_message.id,
-                    "sender_id": user.id,
-                    "sender_name": user.full_name,
-                    "sender_role": user.role,
-                    "message": message_text,
-                    "created_at": str(chat_message.created_at)
-                })
-                
-                await websocket.send_json({
-                    "type": "sent",
-                    "id": chat_message.id,
-                    "created_at": str(chat_message.created_at)
-                })
+                if CHAT_GROUP_COMMIT:
+                    # Queued for the next batch; delivered and acknowledged once it commits,
+                    # while this loop keeps reading
+                    stored = await chat_writer.submit(user.id, receiver_id, message_text, client=token)
+                    task = asyncio.create_task(_deliver_when_stored(connection, user, receiver_id, message_text, stored))
+                    _pending_deliveries.add(task)
+                    task.add_done_callback(_pending_deliveries.discard)
+                else:
+                    stored = await _store_message(user.id, receiver_id, message_text, token)
+                    await _deliver_stored(connection, user, receiver_id, message_text, stored)
                 
     except WebSocketDisconnect:
-        manager.disconnect(user.id)
+        pass
     except Exception as e:
         print(f"WebSocket error: {e}")
     finally:
-        db.close()
\ No newline at end of file
+        if connection is not None:
+            await manager.disconnect(connection)
\ No newline at end of file
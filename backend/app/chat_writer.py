@@ -0,0 +1,170 @@
+import asyncio
+import os
+from datetime import datetime
+
+from sqlalchemy import select
+
+from . import models
+from .database import AsyncSessionLocal, read_your_writes
+
+# A batch is committed once it holds this many messages...
+CHAT_WRITE_BATCH_SIZE = int(os.environ.get("CHAT_WRITE_BATCH_SIZE", "200"))
+# ...or this many milliseconds after its first message arrived
+CHAT_WRITE_BATCH_DELAY_MS = float(os.environ.get("CHAT_WRITE_BATCH_DELAY_MS", "5"))
+# Messages waiting for a batch; submit() waits for room, which slows down the sockets
+CHAT_WRITE_QUEUE_SIZE = int(os.environ.get("CHAT_WRITE_QUEUE_SIZE", "10000"))
+
+
+class PendingMessage:
+    def __init__(self, sender_id, receiver_id, text, client, future):
+        self.sender_id = sender_id
+        self.receiver_id = receiver_id
+        self.text = text
+        self.client = client
+        self.future = future
+
+    @property
+    def pair(self):
+        return min(self.sender_id, self.receiver_id), max(self.sender_id, self.receiver_id)
+
+
+class ChatWriter:
+    """Write-behind writer for chat messages: messages from every socket are coalesced into
+    one transaction (one commit, one fsync on SQLite) per batch.
+
+    ``submit`` returns a future that resolves to the stored message's ``id``,
+    ``conversation_id`` and ``created_at`` once its batch has committed.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal, batch_size=CHAT_WRITE_BATCH_SIZE,
+                 batch_delay_ms=CHAT_WRITE_BATCH_DELAY_MS, queue_size=CHAT_WRITE_QUEUE_SIZE):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay_ms / 1000
+        self.queue_size = queue_size
+        self.queue = None
+        self._task = None
+        self.metrics = {"messages": 0, "batches": 0, "failed": 0}
+
+    async def start(self):
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self._task = asyncio.create_task(self._run())
+
+    async def submit(self, sender_id, receiver_id, text, client=None):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put(PendingMessage(sender_id, receiver_id, text, client, future))
+        return future
+
+    async def write(self, sender_id, receiver_id, text, client=None):
+        return await (await self.submit(sender_id, receiver_id, text, client))
+
+    async def _collect(self):
+        batch = [await self.queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.batch_delay
+        while len(batch) < self.batch_size:
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            try:
+                await self._store(batch)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    async def _store(self, batch):
+        try:
+            results = await self._commit(batch)
+        except Exception as e:
+            # Retry one by one, so a bad message only fails itself
+            print(f"⚠️ Chat batch of {len(batch)} failed ({e}); writing messages individually")
+            for message in batch:
+                try:
+                    self._resolve([message], await self._commit([message]))
+                except Exception as error:
+                    self.metrics["failed"] += 1
+                    if not message.future.done():
+                        message.future.set_exception(error)
+            return
+        self._resolve(batch, results)
+
+    def _resolve(self, batch, results):
+        for message, result in zip(batch, results):
+            if not message.future.done():
+                message.future.set_result(result)
+
+    async def _commit(self, batch):
+        """Store a batch in one transaction: one conversation lookup, the message INSERT,
+        the last-message UPDATEs and a single COMMIT"""
+        pairs = {message.pair for message in batch}
+        user_ids = {user_id for pair in pairs for user_id in pair}
+        conversation = models.ChatConversation
+        now = datetime.utcnow()
+        async with self.session_factory() as db:
+            # Conversations among the batch's users (a superset of its pairs), either orientation
+            conversations = {}
+            for found in (await db.scalars(select(conversation).where(
+                conversation.user1_id.in_(user_ids), conversation.user2_id.in_(user_ids)
+            ).order_by(conversation.id))).all():
+                pair = min(found.user1_id, found.user2_id), max(found.user1_id, found.user2_id)
+                if pair in pairs:
+                    conversations.setdefault(pair, found)
+            for pair in pairs - conversations.keys():
+                conversations[pair] = conversation(user1_id=pair[0], user2_id=pair[1])
+                db.add(conversations[pair])
+            await db.flush()
+
+            rows = []
+            for message in batch:
+                rows.append(models.ChatMessage(
+                    conversation_id=conversations[message.pair].id,
+                    sender_id=message.sender_id,
+                    receiver_id=message.receiver_id,
+                    message=message.text,
+                    created_at=now
+                ))
+                # Messages are in arrival order, so the last one per conversation wins
+                conversations[message.pair].last_message = message.text[:100]
+                conversations[message.pair].last_message_time = now
+            db.add_all(rows)
+            await db.commit()
+
+        for client in {message.client for message in batch}:
+            read_your_writes.mark(client)
+        self.metrics["messages"] += len(batch)
+        self.metrics["batches"] += 1
+        return [{"id": row.id, "conversation_id": row.conversation_id, "created_at": row.created_at} for row in rows]
+
+    async def close(self, timeout=10.0):
+        """Wait (up to ``timeout`` seconds) for the queued messages to be committed, then stop"""
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"⚠️ {self.queue.qsize()} queued chat messages were not stored before shutdown")
+        self._task.cancel()
+        self._task = None
+
+    def snapshot(self):
+        return {
+            "queued": self.queue.qsize() if self.queue is not None else 0,
+            "batch_size": self.batch_size,
+            "batch_delay_ms": self.batch_delay * 1000,
+            "avg_batch": self.metrics["messages"] / self.metrics["batches"] if self.metrics["batches"] else 0.0,
+            **self.metrics
+        }
+
+
+chat_writer = ChatWriter()
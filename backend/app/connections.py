@@ -0,0 +1,147 @@
+import asyncio
+import os
+from typing import Dict, Set
+
+from fastapi import WebSocket
+
+# Events buffered per socket before the slow-consumer policy kicks in
+CHAT_SEND_QUEUE_SIZE = int(os.environ.get("CHAT_SEND_QUEUE_SIZE", "100"))
+# Seconds one send may take; a socket that stalls longer is closed
+CHAT_SEND_TIMEOUT = float(os.environ.get("CHAT_SEND_TIMEOUT", "5"))
+# When a socket's queue is full: "drop_oldest" keeps the socket and discards its oldest
+# queued event (the client catches up from GET /messages), "disconnect" closes it
+CHAT_SLOW_CONSUMER_POLICY = os.environ.get("CHAT_SLOW_CONSUMER_POLICY", "drop_oldest")
+# Close code for sockets dropped as slow consumers ("try again later")
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+
+class Connection:
+    """One socket of a user, with a bounded outbound queue drained by its own writer task,
+    so a slow client only ever delays itself"""
+
+    def __init__(self, manager, user_id: int, websocket: WebSocket):
+        self.manager = manager
+        self.user_id = user_id
+        self.websocket = websocket
+        self.queue = asyncio.Queue(maxsize=manager.queue_size)
+        self.closed = False
+        self._writer = None
+
+    def start(self):
+        """Start sending once the socket is accepted; events queued before that are kept"""
+        self._writer = asyncio.create_task(self._write())
+
+    def send(self, event: dict):
+        """Queue an event without waiting; applies the slow-consumer policy when full"""
+        if self.closed:
+            return
+        if self.queue.full():
+            self.manager.metrics["dropped"] += 1
+            if self.manager.slow_consumer_policy == "disconnect":
+                self.manager.metrics["slow_disconnects"] += 1
+                self.close(SLOW_CONSUMER_CLOSE_CODE)
+                return
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def _write(self):
+        while True:
+            event = await self.queue.get()
+            try:
+                await asyncio.wait_for(self.websocket.send_json(event), self.manager.send_timeout)
+                self.manager.metrics["sent"] += 1
+            except asyncio.TimeoutError:
+                self.manager.metrics["send_timeouts"] += 1
+                self.close(SLOW_CONSUMER_CLOSE_CODE)
+                return
+            except Exception:
+                # The client went away; the receive loop notices and disconnects us
+                self.stop()
+                return
+
+    def close(self, code=1000):
+        """Stop sending, drop what is queued and close the socket in the background; the
+        receive loop then ends and disconnects the connection from the manager"""
+        if self.closed:
+            return
+        self.stop()
+        self.manager.metrics["dropped"] += self.queue.qsize()
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        asyncio.create_task(self._close_socket(code))
+
+    async def _close_socket(self, code):
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+
+    def stop(self):
+        self.closed = True
+        if self._writer is not None and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+
+
+class ConnectionManager:
+    """This worker's sockets, any number per user (tabs, devices). Events for a user go
+    through the backplane, which hands them to the worker(s) holding that user's sockets."""
+
+    def __init__(self, backplane, queue_size=CHAT_SEND_QUEUE_SIZE, send_timeout=CHAT_SEND_TIMEOUT,
+                 slow_consumer_policy=CHAT_SLOW_CONSUMER_POLICY):
+        if slow_consumer_policy not in ("drop_oldest", "disconnect"):
+            raise ValueError(f"Unknown slow consumer policy {slow_consumer_policy!r}")
+        self.active_connections: Dict[int, Set[Connection]] = {}
+        self.backplane = backplane
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.slow_consumer_policy = slow_consumer_policy
+        self.metrics = {"sent": 0, "dropped": 0, "send_timeouts": 0, "slow_disconnects": 0}
+
+    async def connect(self, user_id: int, websocket: WebSocket) -> Connection:
+        # Join the user's set before the first await, so their last other socket closing
+        # during the handshake (a tab reload) can't unsubscribe the channel from under us
+        connections = self.active_connections.setdefault(user_id, set())
+        is_first = not connections
+        connection = Connection(self, user_id, websocket)
+        connections.add(connection)
+        try:
+            # Subscribe before accepting, so nothing published after the handshake is missed
+            if is_first:
+                await self.backplane.subscribe(user_id)
+            await websocket.accept()
+        except BaseException:
+            await self.disconnect(connection)
+            raise
+        connection.start()
+        return connection
+
+    async def disconnect(self, connection: Connection):
+        connection.stop()
+        connections = self.active_connections.get(connection.user_id)
+        if connections is None:
+            return
+        connections.discard(connection)
+        if not connections:
+            del self.active_connections[connection.user_id]
+            await self.backplane.unsubscribe(connection.user_id)
+
+    async def send_message(self, user_id: int, message: dict):
+        await self.backplane.publish(user_id, message)
+
+    async def deliver_local(self, user_id: int, message: dict):
+        # Only queues: every socket's writer task sends concurrently, with its own timeout
+        for connection in list(self.active_connections.get(user_id, ())):
+            connection.send(message)
+
+    def snapshot(self):
+        depths = [connection.queue.qsize() for connections in self.active_connections.values()
+                  for connection in connections]
+        return {
+            "users": len(self.active_connections),
+            "connections": len(depths),
+            "queued": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "queue_size": self.queue_size,
+            "slow_consumer_policy": self.slow_consumer_policy,
+            **self.metrics
+        }
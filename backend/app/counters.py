@@ -0,0 +1,168 @@
+from collections import Counter
+
+from sqlalchemy import Integer, bindparam, case, event, func, select, update
+from sqlalchemy.orm import Session, attributes
+
+from . import models
+
+# Course counter column fed by each course-scoped model
+COURSE_COUNTERS = {
+    models.Enrollment: models.Course.student_count,
+    models.Assignment: models.Course.assignment_count,
+    models.Resource: models.Course.resource_count,
+}
+
+
+def _is_unread(is_read):
+    # Same rule as the `is_read == False` filters: NULL isn't counted
+    return is_read is not None and not is_read
+
+
+def _execute(db, statement):
+    # Counters are adjusted in SQL (col = col + n); don't try to mirror that onto loaded objects
+    db.execute(statement.execution_options(synchronize_session=False))
+
+
+def add_course_counts(db, deltas):
+    """Apply {(course_id, counter column): delta} to the course counters"""
+    per_course = {}
+    for (course_id, column), delta in deltas.items():
+        if delta and course_id is not None:
+            per_course.setdefault(course_id, {})[column.key] = column + delta
+    for course_id, values in per_course.items():
+        _execute(db, update(models.Course).where(models.Course.id == course_id).values(values))
+
+
+_conversations, _users = models.ChatConversation.__table__.c, models.User.__table__.c
+_receiver, _delta = bindparam("receiver_id", type_=Integer), bindparam("delta", type_=Integer)
+# Executed with one parameter set per conversation/user (executemany), so a flush that
+# touches many conversations, like a batch of chat messages, stays two statements
+ADD_CONVERSATION_UNREAD = update(models.ChatConversation.__table__).where(
+    _conversations.id == bindparam("conversation_id", type_=Integer)
+).values(
+    user1_unread=_conversations.user1_unread + case((_conversations.user1_id == _receiver, _delta), else_=0),
+    user2_unread=_conversations.user2_unread + case((_conversations.user2_id == _receiver, _delta), else_=0)
+)
+ADD_USER_UNREAD = update(models.User.__table__).where(
+    _users.id == _receiver
+).values(unread_messages=_users.unread_messages + _delta)
+
+
+def add_unread(db, deltas):
+    """Apply {(conversation_id, receiver_id): delta} to the conversation and user unread counters"""
+    per_user = Counter()
+    per_conversation = []
+    for (conversation_id, receiver_id), delta in deltas.items():
+        if not delta:
+            continue
+        per_user[receiver_id] += delta
+        per_conversation.append({"conversation_id": conversation_id, "receiver_id": receiver_id, "delta": delta})
+    if per_conversation:
+        db.execute(ADD_CONVERSATION_UNREAD, per_conversation)
+    per_user = [{"receiver_id": user_id, "delta": delta} for user_id, delta in per_user.items() if delta]
+    if per_user:
+        db.execute(ADD_USER_UNREAD, per_user)
+
+
+def mark_conversation_read(db, conversation_id, user_id, up_to_id=None):
+    """Mark what ``user_id`` received in a conversation (up to message ``up_to_id``) as read;
+    returns how many messages changed.
+
+    Bulk UPDATEs skip the flush hooks below, so the counters are adjusted here.
+    """
+    criteria = [
+        models.ChatMessage.conversation_id == conversation_id,
+        models.ChatMessage.receiver_id == user_id,
+        models.ChatMessage.is_read == False
+    ]
+    if up_to_id is not None:
+        criteria.append(models.ChatMessage.id <= up_to_id)
+    result = db.execute(update(models.ChatMessage).where(*criteria).values(is_read=True))
+    add_unread(db, {(conversation_id, user_id): -result.rowcount})
+    return result.rowcount
+
+
+# ------------------ INCREMENTAL MAINTENANCE ------------------
+# ORM inserts/deletes of enrollments, assignments, resources and chat messages
+# (and is_read changes) adjust the counters in the same transaction as the write.
+
+@event.listens_for(Session, "before_flush")
+def _collect_read_state_changes(session, flush_context, instances):
+    # Needs the pre-flush value, which an expired object only has in the database
+    pending = session.info.setdefault("unread_deltas", Counter())
+    with session.no_autoflush:
+        for obj in session.dirty:
+            if not isinstance(obj, models.ChatMessage):
+                continue
+            history = attributes.get_history(obj, "is_read")
+            if not history.has_changes():
+                continue
+            if history.deleted:
+                was_unread = _is_unread(history.deleted[0])
+            else:
+                was_unread = _is_unread(session.scalar(
+                    select(models.ChatMessage.is_read).where(models.ChatMessage.id == obj.id)
+                ))
+            pending[(obj.conversation_id, obj.receiver_id)] += _is_unread(obj.is_read) - was_unread
+
+
+@event.listens_for(Session, "after_flush")
+def _update_counters_after_flush(session, flush_context):
+    course_deltas = Counter()
+    unread_deltas = session.info.pop("unread_deltas", Counter())
+    for objects, sign in ((session.new, 1), (session.deleted, -1)):
+        for obj in objects:
+            column = COURSE_COUNTERS.get(type(obj))
+            if column is not None:
+                course_deltas[(obj.course_id, column)] += sign
+            elif isinstance(obj, models.ChatMessage) and _is_unread(obj.is_read):
+                unread_deltas[(obj.conversation_id, obj.receiver_id)] += sign
+
+    add_course_counts(session, course_deltas)
+    add_unread(session, unread_deltas)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_unread_deltas(session):
+    session.info.pop("unread_deltas", None)
+
+
+# ------------------ RECONCILIATION ------------------
+
+def _count(model, *criteria):
+    return select(func.count()).select_from(model).where(*criteria).scalar_subquery()
+
+
+def _unread_messages(*criteria):
+    return _count(models.ChatMessage, models.ChatMessage.is_read == False, *criteria)
+
+
+def counter_definitions():
+    """(name, model, counter column, correlated COUNT(*) it must equal)"""
+    conversation = models.ChatConversation
+    return [
+        (f"courses.{column.key}", models.Course, column, _count(model, model.course_id == models.Course.id))
+        for model, column in COURSE_COUNTERS.items()
+    ] + [
+        ("users.unread_messages", models.User, models.User.unread_messages,
+         _unread_messages(models.ChatMessage.receiver_id == models.User.id)),
+        ("chat_conversations.user1_unread", conversation, conversation.user1_unread,
+         _unread_messages(models.ChatMessage.conversation_id == conversation.id,
+                          models.ChatMessage.receiver_id == conversation.user1_id)),
+        ("chat_conversations.user2_unread", conversation, conversation.user2_unread,
+         _unread_messages(models.ChatMessage.conversation_id == conversation.id,
+                          models.ChatMessage.receiver_id == conversation.user2_id)),
+    ]
+
+
+def reconcile_counters(db, repair=True):
+    """Recount every counter from the source rows; returns {counter name: rows that had drifted}.
+
+    With ``repair`` the drifted rows are rewritten in place (the caller commits).
+    """
+    drift = {}
+    for name, model, column, expected in counter_definitions():
+        drift[name] = db.scalar(select(func.count()).select_from(model).where(column != expected))
+        if drift[name] and repair:
+            _execute(db, update(model).where(column != expected).values({column.key: expected}))
+    return drift
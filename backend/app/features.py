@@ -0,0 +1,177 @@
+from sqlalchemy import and_, case, delete, event, func, select
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import primary_bind, upsert_insert
+
+# Used when an enrollment has no attendance or graded submissions yet, and for
+# the inputs we don't record at all (participation, previous grades, study hours)
+FEATURE_DEFAULTS = {
+    'attendance_rate': 0.85,
+    'assignment_avg': 85.0,
+    'participation_score': 7.5,
+    'previous_grades': 85.0,
+    'study_hours': 12.0
+}
+
+
+def _aggregate(db, enrollment_filter):
+    """Per-enrollment attendance and grade aggregates with two GROUP BY queries"""
+    aggregates = {}
+
+    attendance_rows = db.execute(
+        select(
+            models.Attendance.enrollment_id,
+            func.count(models.Attendance.id),
+            func.sum(case((models.Attendance.status == "present", 1), else_=0))
+        )
+        .join(models.Enrollment, models.Enrollment.id == models.Attendance.enrollment_id)
+        .where(enrollment_filter)
+        .group_by(models.Attendance.enrollment_id)
+    ).all()
+    for enrollment_id, total, present in attendance_rows:
+        aggregates[enrollment_id] = {"attendance_total": total, "attendance_present": present or 0}
+
+    # Grades only count towards the course the assignment belongs to
+    grade_rows = db.execute(
+        select(
+            models.Enrollment.id,
+            func.count(models.AssignmentSubmission.grade),
+            func.sum(models.AssignmentSubmission.grade)
+        )
+        .join(models.AssignmentSubmission,
+              models.AssignmentSubmission.student_id == models.Enrollment.student_id)
+        .join(models.Assignment, and_(
+            models.Assignment.id == models.AssignmentSubmission.assignment_id,
+            models.Assignment.course_id == models.Enrollment.course_id
+        ))
+        .where(enrollment_filter, models.AssignmentSubmission.grade.isnot(None))
+        .group_by(models.Enrollment.id)
+    ).all()
+    for enrollment_id, graded_count, grade_sum in grade_rows:
+        aggregates.setdefault(enrollment_id, {}).update(
+            {"graded_count": graded_count, "grade_sum": grade_sum or 0.0}
+        )
+
+    return aggregates
+
+
+AGGREGATE_COLUMNS = ("attendance_total", "attendance_present", "graded_count", "grade_sum")
+
+
+def refresh_enrollment_features(db, enrollment_ids):
+    """Recompute and store the materialized features for the given enrollments"""
+    enrollment_ids = list(set(enrollment_ids))
+    if not enrollment_ids:
+        return
+    aggregates = _aggregate(db, models.Enrollment.id.in_(enrollment_ids))
+    # ON CONFLICT rather than delete + insert: two first views of an enrollment, or a view
+    # and an attendance write, may refresh the same rows concurrently
+    upsert = upsert_insert(db, models.EnrollmentFeatures)
+    db.execute(upsert.on_conflict_do_update(
+        index_elements=[models.EnrollmentFeatures.enrollment_id],
+        set_={**{column: upsert.excluded[column] for column in AGGREGATE_COLUMNS}, "updated_at": func.now()}
+    ), [
+        {
+            "enrollment_id": enrollment_id,
+            "attendance_total": aggregates.get(enrollment_id, {}).get("attendance_total", 0),
+            "attendance_present": aggregates.get(enrollment_id, {}).get("attendance_present", 0),
+            "graded_count": aggregates.get(enrollment_id, {}).get("graded_count", 0),
+            "grade_sum": aggregates.get(enrollment_id, {}).get("grade_sum", 0.0)
+        }
+        for enrollment_id in enrollment_ids
+    ])
+
+
+def to_feature_dict(row):
+    """Turn an EnrollmentFeatures row into the model's five input features"""
+    features = dict(FEATURE_DEFAULTS)
+    if row is not None and row.attendance_total:
+        features['attendance_rate'] = row.attendance_present / row.attendance_total
+    if row is not None and row.graded_count:
+        features['assignment_avg'] = row.grade_sum / row.graded_count
+    return features
+
+
+def get_features(db, enrollment_ids):
+    """Return {enrollment_id: feature dict}, backfilling any enrollments not materialized yet"""
+    enrollment_ids = list(enrollment_ids)
+    if not enrollment_ids:
+        return {}
+
+    def load(session, ids):
+        return {
+            row.enrollment_id: row
+            for row in session.execute(
+                select(models.EnrollmentFeatures)
+                .where(models.EnrollmentFeatures.enrollment_id.in_(ids))
+            ).scalars()
+        }
+
+    rows = load(db, enrollment_ids)
+    missing = [enrollment_id for enrollment_id in enrollment_ids if enrollment_id not in rows]
+    if missing:
+        # Backfill in a separate transaction on the primary, so the caller's session (and the
+        # objects it has loaded) isn't committed or expired by a read. The backfilled rows are
+        # read back through the same session: a replica may not have them yet
+        with Session(bind=primary_bind(db)) as backfill:
+            refresh_enrollment_features(backfill, missing)
+            backfill.commit()
+            rows.update(load(backfill, missing))
+
+    return {enrollment_id: to_feature_dict(rows.get(enrollment_id)) for enrollment_id in enrollment_ids}
+
+
+def get_enrollment_features(db, enrollment_id):
+    return get_features(db, [enrollment_id])[enrollment_id]
+
+
+def get_primary_enrollment_features(db, enrollment_id):
+    """Like get_enrollment_features, but always read from the primary. Use it for results
+    that get cached: the cache is invalidated when a write commits, and a lagging replica
+    could still serve the old features after that"""
+    if db.get_bind() is primary_bind(db):
+        return get_enrollment_features(db, enrollment_id)
+    with Session(bind=primary_bind(db)) as primary:
+        return get_enrollment_features(primary, enrollment_id)
+
+
+def get_course_features(db, course_id):
+    """Features for every enrollment in a course, keyed by enrollment id"""
+    enrollment_ids = db.execute(
+        select(models.Enrollment.id).where(models.Enrollment.course_id == course_id)
+    ).scalars().all()
+    return get_features(db, enrollment_ids)
+
+
+# ------------------ INCREMENTAL MAINTENANCE ------------------
+# Attendance and submission writes refresh only the enrollments they touch,
+# inside the same transaction as the write.
+
+@event.listens_for(Session, "before_flush")
+def _drop_features_of_deleted_enrollments(session, flush_context, instances):
+    deleted = [obj.id for obj in session.deleted if isinstance(obj, models.Enrollment)]
+    if deleted:
+        session.execute(delete(models.EnrollmentFeatures).where(
+            models.EnrollmentFeatures.enrollment_id.in_(deleted)
+        ))
+
+
+@event.listens_for(Session, "after_flush")
+def _refresh_features_after_flush(session, flush_context):
+    enrollment_ids = set()
+    submissions = []
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, models.Attendance) and obj.enrollment_id is not None:
+            enrollment_ids.add(obj.enrollment_id)
+        elif isinstance(obj, models.AssignmentSubmission) and obj.student_id is not None:
+            submissions.append((obj.student_id, obj.assignment_id))
+
+    for student_id, assignment_id in submissions:
+        enrollment_ids.update(session.execute(
+            select(models.Enrollment.id)
+            .join(models.Assignment, models.Assignment.course_id == models.Enrollment.course_id)
+            .where(models.Enrollment.student_id == student_id, models.Assignment.id == assignment_id)
+        ).scalars())
+
+    refresh_enrollment_features(session, enrollment_ids)
@@ -0,0 +1,159 @@
+import numpy as np
+
+
+class FlatForest:
+    """A RandomForestClassifier compiled into flat node arrays.
+
+    All trees are concatenated into one set of arrays. Leaves point at
+    themselves (left == right == node), so every row can be walked through
+    every tree in lock-step for ``max_depth`` steps without branching.
+    ``value`` holds each node's class distribution already normalised the
+    way ``DecisionTreeClassifier.predict_proba`` does it, so the averaged
+    output matches ``RandomForestClassifier.predict_proba`` bit for bit.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth, classes):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.classes = classes
+        # left/right interleaved, so one step is a single gather at 2 * node + went_right
+        # (a private copy; small next to the mmap-shared arrays)
+        self.children = np.stack([left, right], axis=1).ravel()
+        self._path_contributions = {}
+
+    ARRAYS = ("feature", "threshold", "left", "right", "value", "roots", "classes")
+    PREFIX = "forest."
+
+    def to_artifacts(self):
+        """Flat arrays as {filename: ndarray} for the model registry (.npy, mmap-able)"""
+        artifacts = {f"{self.PREFIX}{name}.npy": np.ascontiguousarray(getattr(self, name))
+                     for name in self.ARRAYS}
+        artifacts[f"{self.PREFIX}max_depth.npy"] = np.array(self.max_depth, dtype=np.intp)
+        return artifacts
+
+    @classmethod
+    def has_artifacts(cls, filenames):
+        return all(f"{cls.PREFIX}{name}.npy" in filenames for name in cls.ARRAYS + ("max_depth",))
+
+    @classmethod
+    def from_artifacts(cls, artifacts):
+        """Rebuild from registry artifacts; memory-mapped arrays are used as-is, not copied"""
+        arrays = {name: artifacts[f"{cls.PREFIX}{name}.npy"] for name in cls.ARRAYS}
+        return cls(max_depth=int(artifacts[f"{cls.PREFIX}max_depth.npy"]), **arrays)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def apply(self, X, explain_class=None):
+        """Return the leaf index reached in every tree, shape (n_samples, n_trees).
+
+        With ``explain_class`` set, also return Saabas-style per-feature
+        contributions to that class's probability, shape (n_samples,
+        n_features): along each path, the change in the node's class share is
+        credited to the feature the parent split on, then averaged over trees.
+        """
+        # sklearn trees compare float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        n_samples, n_features = X.shape
+        # Gathers on flat arrays (take) rather than 2-D fancy indexing: about twice as fast
+        X_flat = X.ravel()
+        slots = np.arange(n_samples)[:, None] * n_features
+        nodes = np.broadcast_to(self.roots, (n_samples, self.n_trees)).copy()
+        for _ in range(self.max_depth):
+            went_right = ~(X_flat.take(slots + self.feature.take(nodes)) <= self.threshold.take(nodes))
+            nodes = self.children.take(2 * nodes + went_right)
+        if explain_class is None:
+            return nodes
+        # A leaf's path is fixed, so its contributions are too: one gather per (row, tree)
+        paths = self.path_contributions(explain_class, n_features)
+        return nodes, paths[nodes].sum(axis=1) / self.n_trees
+
+    def path_contributions(self, explain_class, n_features):
+        """Per-node contributions accumulated from the root, shape (n_nodes, n_features);
+        computed once per class, level by level"""
+        key = (explain_class, n_features)
+        paths = self._path_contributions.get(key)
+        if paths is None:
+            class_value = self.value[:, explain_class]
+            paths = np.zeros((len(self.feature), n_features))
+            parents = self.roots[self.left[self.roots] != self.roots]
+            while len(parents):
+                for children in (self.left[parents], self.right[parents]):
+                    paths[children] = paths[parents]
+                    paths[children, self.feature[parents]] += class_value[children] - class_value[parents]
+                children = np.concatenate([self.left[parents], self.right[parents]])
+                parents = children[self.left[children] != children]
+            self._path_contributions[key] = paths
+        return paths
+
+    def _average_leaves(self, leaves):
+        proba = np.zeros((leaves.shape[0], self.value.shape[1]), dtype=np.float64)
+        # Accumulate tree by tree, in estimator order, like the forest does
+        for t in range(self.n_trees):
+            proba += self.value[leaves[:, t]]
+        proba /= self.n_trees
+        return proba
+
+    def predict_proba(self, X):
+        return self._average_leaves(self.apply(X))
+
+    def predict_proba_explained(self, X, explain_class=1):
+        """predict_proba plus (bias, contributions) for ``explain_class`` from the same traversal.
+
+        bias + contributions.sum(axis=1) equals proba[:, explain_class] up to rounding.
+        """
+        leaves, contributions = self.apply(X, explain_class)
+        bias = float(np.mean(self.value[self.roots, explain_class]))
+        return self._average_leaves(leaves), bias, contributions
+
+    def predict(self, X):
+        return self.classes[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def compile_forest(model):
+    """Export a fitted RandomForestClassifier (single output) as a FlatForest"""
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        n_nodes = tree.node_count
+        node_ids = np.arange(n_nodes)
+        is_leaf = tree.children_left == -1
+
+        value = tree.value[:, 0, :len(model.classes_)].astype(np.float64)
+        normalizer = value.sum(axis=1)[:, np.newaxis]
+        normalizer[normalizer == 0.0] = 1.0
+        value = value / normalizer
+
+        features.append(np.where(is_leaf, 0, tree.feature).astype(np.intp))
+        thresholds.append(np.where(is_leaf, 0.0, tree.threshold).astype(np.float64))
+        lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+        rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+        values.append(value)
+        roots.append(offset)
+
+        offset += n_nodes
+        max_depth = max(max_depth, tree.max_depth)
+
+    return FlatForest(
+        feature=np.concatenate(features),
+        threshold=np.concatenate(thresholds),
+        left=np.concatenate(lefts).astype(np.intp),
+        right=np.concatenate(rights).astype(np.intp),
+        value=np.concatenate(values),
+        roots=np.array(roots, dtype=np.intp),
+        max_depth=max_depth,
+        classes=np.asarray(model.classes_)
+    )
+
+
+def check_parity(model, forest, X):
+    """True when the flat forest reproduces model.predict_proba exactly on X"""
+    return np.array_equal(model.predict_proba(X), forest.predict_proba(X))
@@ -0,0 +1,108 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# "thread" keeps the model shared in-process; "process" sidesteps the GIL
+INFERENCE_EXECUTOR = os.environ.get("INFERENCE_EXECUTOR", "thread")
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", "2"))
+INFERENCE_MAX_PENDING = int(os.environ.get("INFERENCE_MAX_PENDING", "64"))
+INFERENCE_TIMEOUT = float(os.environ.get("INFERENCE_TIMEOUT", "5"))
+
+
+class InferenceExecutor:
+    """Runs CPU-bound model work off the event loop.
+
+    At most ``max_pending`` jobs may be queued or running; beyond that, and
+    when a job takes longer than ``timeout`` seconds, callers get their
+    ``fallback`` value instead of waiting.
+    """
+
+    def __init__(self, kind=INFERENCE_EXECUTOR, max_workers=INFERENCE_WORKERS,
+                 max_pending=INFERENCE_MAX_PENDING, timeout=INFERENCE_TIMEOUT):
+        if kind not in ("thread", "process"):
+            raise ValueError("Inference executor must be 'thread' or 'process'")
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._executor = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    def _get_executor(self):
+        # Created lazily so importing this module (e.g. in a pool worker) never spawns pools
+        with self._lock:
+            if self._executor is None:
+                if self.kind == "process":
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context("spawn")
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix="inference"
+                    )
+            return self._executor
+
+    def _job_done(self, _future):
+        with self._lock:
+            self.pending -= 1
+
+    async def run(self, fn, *args, fallback=None):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                return fallback
+            self.pending += 1
+
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception as e:
+            self._job_done(None)
+            self.errors += 1
+            print(f"❌ Inference submit failed: {e}")
+            return fallback
+        future.add_done_callback(self._job_done)
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            print(f"⚠️ Inference timed out after {self.timeout}s - using fallback")
+            return fallback
+        except Exception as e:
+            self.errors += 1
+            print(f"❌ Inference failed: {e}")
+            return fallback
+
+    def stats(self):
+        return {
+            "kind": self.kind,
+            "pending": self.pending,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "errors": self.errors
+        }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def run_in_subprocess(fn, *args):
+    """Run fn in a fresh single-use process (used for retraining)"""
+    executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        return await asyncio.wrap_future(executor.submit(fn, *args))
+    finally:
+        executor.shutdown(wait=False)
+
+
+inference_executor = InferenceExecutor()
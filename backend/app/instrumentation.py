@@ -0,0 +1,163 @@
+import contextvars
+import os
+import re
+import threading
+import time
+from collections import Counter
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Add X-DB-* headers with the request's query count, DB time and repeated statements
+SQL_DEBUG_HEADERS = os.environ.get("SQL_DEBUG_HEADERS", "0") == "1"
+# Fail the request (500) as soon as an endpoint exceeds its query budget; meant for
+# tests and local runs. Otherwise overruns are only logged and counted in the metrics.
+QUERY_BUDGET_ENFORCE = os.environ.get("QUERY_BUDGET_ENFORCE", "0") == "1"
+# The same statement shape this many times in one request is reported as a likely N+1
+N_PLUS_ONE_THRESHOLD = int(os.environ.get("N_PLUS_ONE_THRESHOLD", "3"))
+
+# Bind-parameter lists (IN (?, ?, ?) / IN (%(p_1)s, ...) / IN ($1, $2)) collapse to one shape
+_PARAMETER_LIST = re.compile(r"\(\s*(?:\?|%\(\w+\)s|\$\d+)(?:\s*,\s*(?:\?|%\(\w+\)s|\$\d+))*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+def query_budget(max_queries):
+    """Declare the most SQL statements an endpoint may issue per request (authentication included)"""
+    def decorate(endpoint):
+        endpoint.query_budget = max_queries
+        return endpoint
+    return decorate
+
+
+def statement_shape(statement):
+    return _WHITESPACE.sub(" ", _PARAMETER_LIST.sub("(?)", statement)).strip()
+
+
+class RequestQueries:
+    """SQL statements issued while handling one request"""
+
+    def __init__(self, scope=None):
+        self.scope = scope or {}
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+        self.over_budget = False
+
+    @property
+    def budget(self):
+        return getattr(self.scope.get("endpoint"), "query_budget", None)
+
+    def repeated(self, threshold=N_PLUS_ONE_THRESHOLD):
+        """{statement shape: executions} for shapes run at least ``threshold`` times"""
+        return {shape: n for shape, n in self.shapes.items() if n >= threshold}
+
+    def record(self, statement):
+        self.count += 1
+        self.shapes[statement_shape(statement)] += 1
+        budget = self.budget
+        if budget is not None and self.count > budget and not self.over_budget:
+            self.over_budget = True
+            message = (f"{self.scope.get('method', '')} {self.scope.get('path', '')} issued more than "
+                       f"{budget} queries")
+            if QUERY_BUDGET_ENFORCE:
+                raise QueryBudgetExceeded(message)
+            print(f"⚠️ Query budget exceeded: {message}")
+
+
+_current = contextvars.ContextVar("request_queries", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    queries = _current.get()
+    if queries is not None:
+        queries.record(statement)
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    queries = _current.get()
+    started = conn.info.get("query_started")
+    if queries is not None and started:
+        queries.seconds += time.perf_counter() - started.pop()
+
+
+def route_label(scope):
+    """"GET /api/teacher/analytics/{course_id}": the request path with path parameters templated back"""
+    templates = {str(value): f"{{{name}}}" for name, value in scope.get("path_params", {}).items()}
+    path = "/".join(templates.get(segment, segment) for segment in scope["path"].split("/"))
+    return f"{scope['method']} {path}"
+
+
+class SQLMetrics:
+    """Per-route totals of the request query stats, for GET /metrics/sql"""
+
+    def __init__(self):
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def observe(self, route, queries):
+        with self._lock:
+            totals = self._routes.setdefault(route, {
+                "requests": 0, "queries": 0, "max_queries": 0, "db_seconds": 0.0,
+                "n_plus_one_requests": 0, "over_budget_requests": 0
+            })
+            totals["budget"] = queries.budget
+            totals["requests"] += 1
+            totals["queries"] += queries.count
+            totals["max_queries"] = max(totals["max_queries"], queries.count)
+            totals["db_seconds"] += queries.seconds
+            totals["n_plus_one_requests"] += bool(queries.repeated())
+            totals["over_budget_requests"] += queries.over_budget
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                route: {**totals, "avg_queries": totals["queries"] / totals["requests"]}
+                for route, totals in self._routes.items()
+            }
+
+
+sql_metrics = SQLMetrics()
+
+
+class QueryStatsMiddleware:
+    """ASGI middleware that collects RequestQueries for every HTTP request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        queries = RequestQueries(scope)
+        token = _current.set(queries)
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start" and SQL_DEBUG_HEADERS:
+                headers = list(message.get("headers", []))
+                headers += [
+                    (b"x-db-query-count", str(queries.count).encode()),
+                    (b"x-db-time-ms", f"{queries.seconds * 1000:.1f}".encode()),
+                    (b"x-db-repeated", str(sum(queries.repeated().values())).encode()),
+                ]
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            _current.reset(token)
+            # Unmatched paths (404s) aren't recorded, so the metrics keys stay bounded
+            if "endpoint" in scope:
+                sql_metrics.observe(route_label(scope), queries)
+            if SQL_DEBUG_HEADERS:
+                for shape, n in queries.repeated().items():
+                    print(f"⚠️ Possible N+1 in {scope['method']} {scope['path']}: {n}x {shape[:120]}")
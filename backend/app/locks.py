@@ -0,0 +1,31 @@
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking
+    fcntl = None
+
+
+def acquire_file_lock(path, blocking=True):
+    """Take an exclusive lock on ``path`` (created if missing) that every process on this
+    host sees. Returns the open file holding it, or None if ``blocking`` is off and another
+    process holds it. The lock lasts until the file is closed or the process exits."""
+    lock_file = open(path, "a")
+    if fcntl is None:
+        return lock_file
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+    except BlockingIOError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+@contextmanager
+def file_lock(path):
+    """Hold ``acquire_file_lock(path)`` for the duration of a with block"""
+    lock_file = acquire_file_lock(path)
+    try:
+        yield
+    finally:
+        lock_file.close()
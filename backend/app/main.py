@@ -2,19 +2,29 @@ from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 import os
 
 # Import from current directory
 from . import models
 from . import alumni, chat
-from .database import engine, get_db
+from .chat_writer import chat_writer
+from .database import async_engine, replica_async_engine, get_async_db
+from .schema import AUTO_MIGRATE, upgrade_database
 from .schemas import UserCreate, Token
 from .auth import get_password_hash, authenticate_user, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
+from .ml_models import MODEL_REFRESH_SECONDS, performance_predictor
+from .inference import inference_executor
+from .risk_scoring import RISK_SCORING_INTERVAL, risk_scoring_scheduler
+from .instrumentation import QueryStatsMiddleware, sql_metrics
+from .prediction_cache import apply_broadcast, broadcast_invalidations
+import asyncio
 
-# Create database tables
-models.Base.metadata.create_all(bind=engine)
+# Apply pending schema migrations
+if AUTO_MIGRATE:
+    upgrade_database()
 
 app = FastAPI(title="EduHelp API", version="1.0.0")
 
@@ -25,8 +35,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-DB-Query-Count", "X-DB-Time-Ms", "X-DB-Repeated"],
 )
 
+# Per-request SQL counts/timings (X-DB-* headers with SQL_DEBUG_HEADERS=1, GET /metrics/sql)
+app.add_middleware(QueryStatsMiddleware)
+
 # Import and include routers
 from . import auth, student, teacher
 
@@ -36,6 +50,56 @@ app.include_router(teacher.router, prefix="/api", tags=["teacher"])
 app.include_router(alumni.router, prefix="/api", tags=["alumni"])
 app.include_router(chat.router, prefix="/api", tags=["chat"])
 
+# Load the current model version in the background instead of on the first prediction
+@app.on_event("startup")
+async def warm_up_model():
+    performance_predictor.warmup()
+    # Follow versions published by other workers or train_model.py (MODEL_REFRESH_SECONDS)
+    if MODEL_REFRESH_SECONDS > 0:
+        app.state.model_refresh_task = asyncio.create_task(performance_predictor.follow_current())
+
+# Optional in-process batch risk scoring (RISK_SCORING_INTERVAL seconds, 0 = off);
+# one worker per host runs it (RISK_SCORING_LOCK_FILE)
+@app.on_event("startup")
+async def start_risk_scoring_scheduler():
+    if RISK_SCORING_INTERVAL > 0:
+        app.state.risk_scoring_task = asyncio.create_task(risk_scoring_scheduler())
+
+@app.on_event("shutdown")
+async def stop_inference_executor():
+    inference_executor.shutdown()
+    for name in ("risk_scoring_task", "model_refresh_task"):
+        task = getattr(app.state, name, None)
+        if task is not None:
+            task.cancel()
+
+# Cross-worker WebSocket delivery (CHAT_BACKPLANE_URL; in-process when unset)
+@app.on_event("startup")
+async def start_chat_backplane():
+    await chat.manager.backplane.start(chat.manager.deliver_local, on_broadcast=apply_broadcast)
+    # Prediction cache invalidations reach the other workers through it too
+    broadcast_invalidations(chat.manager.backplane.broadcast, asyncio.get_running_loop())
+
+@app.on_event("shutdown")
+async def stop_chat_backplane():
+    broadcast_invalidations(None, None)
+    await chat.manager.backplane.close()
+
+# Group-commit writer for WebSocket messages (CHAT_GROUP_COMMIT)
+@app.on_event("startup")
+async def start_chat_writer():
+    await chat_writer.start()
+
+@app.on_event("shutdown")
+async def stop_chat_writer():
+    # Before the engines are disposed, so queued messages still get stored
+    await chat_writer.close()
+
+@app.on_event("shutdown")
+async def close_database():
+    await async_engine.dispose()
+    await replica_async_engine.dispose()
+
 # Static files
 os.makedirs("uploads/resources", exist_ok=True)
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
@@ -43,7 +107,7 @@ app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 
 # ------------------ REGISTER ------------------
 @app.post("/auth/register")
-async def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     print(f"🔐 Registration attempt for: {user.username}, role: {user.role}")
 
     try:
@@ -54,10 +118,10 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
             raise HTTPException(status_code=400, detail="Password too long")
 
         # Check duplicates
-        if db.query(models.User).filter(models.User.username == user.username).first():
+        if await db.scalar(select(models.User.id).where(models.User.username == user.username)):
             raise HTTPException(status_code=400, detail="Username already registered")
 
-        if db.query(models.User).filter(models.User.email == user.email).first():
+        if await db.scalar(select(models.User.id).where(models.User.email == user.email)):
             raise HTTPException(status_code=400, detail="Email already registered")
 
         # ✅ FIXED ROLE VALIDATION
@@ -77,8 +141,8 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
             role=user.role
         )
         db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
+        await db.refresh(db_user)
 
         # Create role profile
         if user.role == "student":
@@ -94,7 +158,7 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
                 degree="Not Specified"
             ))
 
-        db.commit()
+        await db.commit()
 
         return {
             "message": "User created successfully",
@@ -108,14 +172,14 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 
 # ------------------ LOGIN ------------------
 @app.post("/auth/token", response_model=Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = authenticate_user(db, form_data.username, form_data.password)
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = await authenticate_user(db, form_data.username, form_data.password)
 
     if not user:
         raise HTTPException(status_code=401, detail="Incorrect username or password")
@@ -137,6 +201,17 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics/sql")
+async def get_sql_metrics():
+    """Per-route SQL query counts, DB time, N+1 suspects and budget overruns since startup"""
+    return sql_metrics.snapshot()
+
+@app.get("/metrics/chat")
+async def get_chat_metrics():
+    """This worker's WebSocket connections, outbound queue depth and dropped/timed-out sends,
+    and the message writer's batching"""
+    return {**chat.manager.snapshot(), "writer": chat_writer.snapshot()}
+
 @app.get("/test")
 async def test_endpoint():
     return {"message": "API working"}
@@ -144,11 +219,11 @@ async def test_endpoint():
 
 # ------------------ SEED DEMO DATA ------------------
 @app.post("/seed-demo-data")
-async def seed_demo_data(db: Session = Depends(get_db)):
+async def seed_demo_data(db: AsyncSession = Depends(get_async_db)):
     """Create demo data for testing - teacher, student, and alumni"""
     try:
         # Prevent duplicate seeding
-        if db.query(models.User).filter(models.User.username == "teacher1").first():
+        if await db.scalar(select(models.User.id).where(models.User.username == "teacher1")):
             return {"message": "Demo data already exists"}
 
         # ---------- TEACHER ----------
@@ -160,7 +235,7 @@ async def seed_demo_data(db: Session = Depends(get_db)):
             role="teacher"
         )
         db.add(teacher_user)
-        db.flush()
+        await db.flush()
 
         teacher = models.Teacher(
             user_id=teacher_user.id,
@@ -168,7 +243,7 @@ async def seed_demo_data(db: Session = Depends(get_db)):
             qualifications="PhD"
         )
         db.add(teacher)
-        db.flush()
+        await db.flush()
 
         # ---------- STUDENT ----------
         student_user = models.User(
@@ -179,7 +254,7 @@ async def seed_demo_data(db: Session = Depends(get_db)):
             role="student"
         )
         db.add(student_user)
-        db.flush()
+        await db.flush()
 
         student = models.Student(
             user_id=student_user.id,
@@ -187,7 +262,7 @@ async def seed_demo_data(db: Session = Depends(get_db)):
             department="Computer Science"
         )
         db.add(student)
-        db.flush()
+        await db.flush()
 
         # ---------- ALUMNI ----------
         alumni_user = models.User(
@@ -198,7 +273,7 @@ async def seed_demo_data(db: Session = Depends(get_db)):
             role="alumni"
         )
         db.add(alumni_user)
-        db.flush()
+        await db.flush()
 
         alumni = models.Alumni(
             user_id=alumni_user.id,
@@ -210,7 +285,7 @@ async def seed_demo_data(db: Session = Depends(get_db)):
             linkedin_url="https://linkedin.com/in/johnsmith"
         )
         db.add(alumni)
-        db.flush()
+        await db.flush()
 
         # ---------- COURSES ----------
         course1 = models.Course(
@@ -225,13 +300,13 @@ async def seed_demo_data(db: Session = Depends(get_db)):
         )
         db.add(course1)
         db.add(course2)
-        db.flush()
+        await db.flush()
 
         # ---------- ENROLLMENTS ----------
         db.add(models.Enrollment(student_id=student.id, course_id=course1.id))
         db.add(models.Enrollment(student_id=student.id, course_id=course2.id))
 
-        db.commit()
+        await db.commit()
 
         return {
             "message": "Demo data created successfully",
@@ -243,7 +318,7 @@ async def seed_demo_data(db: Session = Depends(get_db)):
         }
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         return {"error": str(e)}
 
 
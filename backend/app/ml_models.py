@@ -3,14 +3,98 @@ import numpy as np
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
-import joblib
+from sklearn.metrics import accuracy_score, precision_score, recall_score, roc_auc_score
+import asyncio
 import os
+import threading
+import time
+
+from .model_registry import registry, ModelRegistryError
+from .forest_engine import FlatForest, compile_forest, check_parity
+from .inference import inference_executor, run_in_subprocess
+
+FEATURES = ['attendance_rate', 'assignment_avg', 'participation_score',
+            'previous_grades', 'study_hours']
+
+DEFAULT_PREDICTION = {
+    "at_risk": False,
+    "risk_probability": 0.2,
+    "risk_level": "low",
+    "recommendations": ["Maintain current study habits"]
+}
+
+FEATURE_RECOMMENDATIONS = {
+    'attendance_rate': "Improve class attendance rate",
+    'assignment_avg': "Focus on completing assignments on time",
+    'participation_score': "Participate more in class discussions",
+    'previous_grades': "Review material from earlier courses",
+    'study_hours': "Increase weekly study hours",
+}
+
+# A feature is recommended on when it pushes the risk probability up by at least this much
+CONTRIBUTION_THRESHOLD = 0.02
+MAX_RECOMMENDED_FACTORS = 3
+
+# What /teacher/model/retrain trains on: "database" (real history, via training.py) or
+# "synthetic" (generated sample data; development only)
+MODEL_RETRAIN_SOURCE = os.environ.get("MODEL_RETRAIN_SOURCE", "database")
+
+# Without a published version, look for one again at most this often (seconds)
+MISSING_MODEL_RETRY_SECONDS = 30
+# Every worker re-reads CURRENT this often (seconds) and hot-swaps to a newly published
+# version, whoever published it (another worker's retrain, train_model.py); 0 = off
+MODEL_REFRESH_SECONDS = float(os.environ.get("MODEL_REFRESH_SECONDS", "30"))
+
+# Fallback when no explanation is available (sklearn path):
+# (feature index, threshold, recommendation) - flagged when value < threshold
+RECOMMENDATION_RULES = [
+    (0, 0.8, FEATURE_RECOMMENDATIONS['attendance_rate']),
+    (1, 70, FEATURE_RECOMMENDATIONS['assignment_avg']),
+    (4, 10, FEATURE_RECOMMENDATIONS['study_hours']),
+    (2, 6, FEATURE_RECOMMENDATIONS['participation_score']),
+]
+
+def risk_labels(X):
+    """Rule-based at-risk label (1 = at risk) for an N x 5 feature matrix.
+
+    The schema has no recorded outcome yet, so both the synthetic data and the
+    database training pipeline label rows with this rule.
+    """
+    risk_factors = (
+        (X[:, 0] < 0.7) * 3 +
+        (X[:, 1] < 70) * 2 +
+        (X[:, 2] < 5) * 2 +
+        (X[:, 3] < 75) * 2 +
+        (X[:, 4] < 5) * 1
+    )
+    return (risk_factors >= 5).astype(int)
+
+def holdout_metrics(model, X, y):
+    """Accuracy/precision/recall (and ROC AUC when both classes are present) on a holdout set"""
+    if len(y) == 0:
+        return {}
+    predicted = model.predict(X)
+    metrics = {
+        "accuracy": float(accuracy_score(y, predicted)),
+        "precision": float(precision_score(y, predicted, zero_division=0)),
+        "recall": float(recall_score(y, predicted, zero_division=0)),
+        "n_holdout": int(len(y))
+    }
+    if len(np.unique(y)) == 2:
+        metrics["roc_auc"] = float(roc_auc_score(y, model.predict_proba(X)[:, 1]))
+    return metrics
 
 class StudentPerformancePredictor:
     def __init__(self):
         self.model = None
         self.scaler = StandardScaler()
         self.is_trained = False
+        self.model_version = None
+        self.forest = None
+        self._missing_since = None
+        self._load_lock = threading.Lock()
+        # Guards swapping model/scaler/forest so a prediction never mixes versions
+        self._swap_lock = threading.Lock()
         
     def generate_sample_data(self, n_samples=1000):
         """Generate sample data for demonstration"""
@@ -25,145 +109,324 @@ class StudentPerformancePredictor:
         }
         
         # Create target variable (1 = at risk, 0 = not at risk)
-        risk_factors = (
-            (data['attendance_rate'] < 0.7) * 3 +
-            (data['assignment_avg'] < 70) * 2 +
-            (data['participation_score'] < 5) * 2 +
-            (data['previous_grades'] < 75) * 2 +
-            (data['study_hours'] < 5) * 1
-        )
-        
-        data['at_risk'] = (risk_factors >= 5).astype(int)
+        data['at_risk'] = risk_labels(np.column_stack([data[feature] for feature in FEATURES]))
         
         return pd.DataFrame(data)
     
-    def train_model(self):
-        """Train the ML model"""
+    def train_model(self, publish=True, make_current=True):
+        """Train the ML model and publish it as a new registry version"""
         try:
+            started = time.perf_counter()
+            
             # Generate sample data
             df = self.generate_sample_data()
             
             # Prepare features and target
-            features = ['attendance_rate', 'assignment_avg', 'participation_score', 
-                       'previous_grades', 'study_hours']
-            X = df[features]
-            y = df['at_risk']
+            X = df[FEATURES].to_numpy()
+            y = df['at_risk'].to_numpy()
             
             # Split data
             X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
             
             # Scale features
-            X_train_scaled = self.scaler.fit_transform(X_train)
-            X_test_scaled = self.scaler.transform(X_test)
+            scaler = StandardScaler()
+            X_train_scaled = scaler.fit_transform(X_train)
+            X_test_scaled = scaler.transform(X_test)
             
             # Train model
-            self.model = RandomForestClassifier(n_estimators=100, random_state=42)
-            self.model.fit(X_train_scaled, y_train)
+            model = RandomForestClassifier(n_estimators=100, random_state=42)
+            model.fit(X_train_scaled, y_train)
             
-            self.is_trained = True
+            metrics = holdout_metrics(model, X_test_scaled, y_test)
+            accuracy = metrics["accuracy"]
             
-            # Save model
-            os.makedirs('models', exist_ok=True)
-            joblib.dump(self.model, 'models/student_performance_model.pkl')
-            joblib.dump(self.scaler, 'models/scaler.pkl')
-            
-            accuracy = self.model.score(X_test_scaled, y_test)
-            print(f"✅ Model trained with accuracy: {accuracy:.2f}")
+            self.publish_trained(
+                model, scaler, X_test_scaled,
+                metadata={"source": "synthetic", "n_samples": len(df),
+                          "training_seconds": time.perf_counter() - started, **metrics},
+                publish=publish, make_current=make_current
+            )
+            print(f"✅ Model trained with accuracy: {accuracy:.2f} (version {self.model_version})")
             
             return accuracy
         except Exception as e:
             print(f"❌ Model training failed: {e}")
             return 0.0
     
+    def publish_trained(self, model, scaler, X_check, metadata, publish=True, make_current=True):
+        """Compile the flat engine, publish the version and swap it in; returns the version"""
+        # Export the flat inference engine, only if it matches sklearn exactly
+        forest = compile_forest(model)
+        engine_parity = check_parity(model, forest, X_check)
+        if not engine_parity:
+            print("⚠️ Flat forest does not match predict_proba - falling back to sklearn")
+            forest = None
+        
+        # Save model
+        version = None
+        if publish:
+            artifacts = {"model.pkl": model, "scaler.pkl": scaler}
+            if forest is not None:
+                artifacts.update(forest.to_artifacts())
+            version = registry.publish(
+                artifacts,
+                metadata={"features": FEATURES, "n_trees": len(model.estimators_),
+                          "engine_parity": engine_parity, **metadata},
+                make_current=make_current
+            )
+        self._install(model, scaler, forest, version)
+        return version
+    
     def predict_student_risk(self, student_data):
         """Predict if a student is at risk"""
+        return self.predict_many([student_data])[0]
+
+    def to_feature_matrix(self, rows):
+        """Build an N x 5 feature matrix from an array or a list of feature dicts"""
+        if isinstance(rows, np.ndarray):
+            X = np.asarray(rows, dtype=float)
+        else:
+            X = np.array([[row.get(feature, 0) for feature in FEATURES] for row in rows], dtype=float)
+        return X.reshape(-1, len(FEATURES))
+
+    def predict_many(self, rows):
+        """Predict risk for many students with one scaler pass and one predict_proba pass"""
+        return self.predict_many_with_version(rows)[1]
+
+    def predict_many_with_version(self, rows):
+        """predict_many, plus the model version that produced the predictions (None for
+        default predictions), which a hot swap may have changed since the call started"""
         if not self.is_trained:
             self.load_model()
-            
-        if self.model is None:
+
+        X = self.to_feature_matrix(rows)
+        if len(X) == 0:
+            return self.model_version, []
+
+        with self._swap_lock:
+            model, scaler, forest, version = self.model, self.scaler, self.forest, self.model_version
+
+        if model is None and forest is None:
             # Return default prediction if model not available
-            return {
-                "at_risk": False,
-                "risk_probability": 0.2,
-                "risk_level": "low",
-                "recommendations": ["Maintain current study habits"]
-            }
-        
+            return None, [dict(DEFAULT_PREDICTION) for _ in range(len(X))]
+
         try:
-            # Prepare input data
-            features = ['attendance_rate', 'assignment_avg', 'participation_score', 
-                       'previous_grades', 'study_hours']
-            
-            input_data = np.array([[student_data.get(feature, 0) for feature in features]])
-            input_scaled = self.scaler.transform(input_data)
-            
-            prediction = self.model.predict(input_scaled)[0]
-            probability = self.model.predict_proba(input_scaled)[0][1]
-            
-            # Determine risk level
-            if probability < 0.3:
-                risk_level = "low"
-            elif probability < 0.7:
-                risk_level = "medium"
+            input_scaled = self._scale(X, scaler)
+            contributions = None
+            if forest is not None:
+                # Probabilities and per-feature contributions from one traversal
+                probabilities, bias, contributions = forest.predict_proba_explained(input_scaled)
+                classes = forest.classes
             else:
-                risk_level = "high"
-            
+                probabilities = model.predict_proba(input_scaled)
+                classes = model.classes_
+
+            # Same class decision as model.predict, derived from the probabilities
+            predictions = classes[np.argmax(probabilities, axis=1)]
+            risk_probability = probabilities[:, 1]
+
+            # Determine risk level
+            risk_levels = np.select(
+                [risk_probability < 0.3, risk_probability < 0.7],
+                ["low", "medium"],
+                default="high"
+            )
+
             # Generate recommendations
-            recommendations = self._generate_recommendations(student_data, risk_level)
-            
-            return {
-                "at_risk": bool(prediction),
-                "risk_probability": float(probability),
-                "risk_level": risk_level,
-                "recommendations": recommendations
-            }
+            if contributions is not None:
+                recommendations = self._recommendations_from_contributions(contributions, risk_levels)
+            else:
+                recommendations = self._generate_recommendations_batch(X, risk_levels)
+
+            results = [
+                {
+                    "at_risk": bool(predictions[i]),
+                    "risk_probability": float(risk_probability[i]),
+                    "risk_level": str(risk_levels[i]),
+                    "recommendations": recommendations[i]
+                }
+                for i in range(len(X))
+            ]
+            if contributions is not None:
+                for result, row in zip(results, contributions):
+                    result["explanation"] = {
+                        "base_risk": bias,
+                        "contributions": {feature: float(value) for feature, value in zip(FEATURES, row)}
+                    }
+            return version, results
         except Exception as e:
             print(f"❌ Prediction error: {e}")
-            return {
-                "at_risk": False,
-                "risk_probability": 0.2,
-                "risk_level": "low",
-                "recommendations": ["Error in prediction - using default recommendations"]
-            }
-    
+            fallback = dict(DEFAULT_PREDICTION)
+            fallback["recommendations"] = ["Error in prediction - using default recommendations"]
+            return None, [dict(fallback) for _ in range(len(X))]
+
+    score_batch = predict_many
+
+    async def predict_many_async(self, rows):
+        """predict_many on the inference executor; default predictions on overload or timeout"""
+        return (await self.predict_many_with_version_async(rows))[1]
+
+    async def predict_many_with_version_async(self, rows):
+        """predict_many_with_version on the inference executor"""
+        fallback = (None, [dict(DEFAULT_PREDICTION, fallback=True) for _ in range(len(rows))])
+        if inference_executor.kind == "process":
+            # Pool processes hold their own predictor; pass the version so they follow hot swaps
+            return await inference_executor.run(
+                _predict_many_in_worker, rows, self.model_version, fallback=fallback
+            )
+        return await inference_executor.run(self.predict_many_with_version, rows, fallback=fallback)
+
+    async def predict_student_risk_async(self, student_data):
+        return (await self.predict_many_async([student_data]))[0]
+
+    def _scale(self, X, scaler=None):
+        """StandardScaler.transform without sklearn's per-call validation (same arithmetic)"""
+        scaler = scaler or self.scaler
+        return (X - scaler.mean_) / scaler.scale_
+
     def _generate_recommendations(self, student_data, risk_level):
         """Generate personalized recommendations"""
+        X = self.to_feature_matrix([student_data])
+        return self._generate_recommendations_batch(X, np.array([risk_level]))[0]
+
+    def _recommendations_from_contributions(self, contributions, risk_levels):
+        """Recommend on the features that push each student's risk up the most"""
+        order = np.argsort(-contributions, axis=1)[:, :MAX_RECOMMENDED_FACTORS]
         recommendations = []
-        
-        if student_data.get('attendance_rate', 1) < 0.8:
-            recommendations.append("Improve class attendance rate")
-        
-        if student_data.get('assignment_avg', 100) < 70:
-            recommendations.append("Focus on completing assignments on time")
-        
-        if student_data.get('study_hours', 20) < 10:
-            recommendations.append("Increase weekly study hours")
-        
-        if student_data.get('participation_score', 10) < 6:
-            recommendations.append("Participate more in class discussions")
-        
-        if risk_level == "high":
-            recommendations.append("Schedule a meeting with your instructor")
-            recommendations.append("Utilize tutoring services")
-        
-        if not recommendations:
-            recommendations.append("Maintain current study habits")
-        
+        for row, top, risk_level in zip(contributions, order, risk_levels):
+            recs = [FEATURE_RECOMMENDATIONS[FEATURES[index]] for index in top
+                    if row[index] >= CONTRIBUTION_THRESHOLD]
+            if risk_level == "high":
+                recs.append("Schedule a meeting with your instructor")
+                recs.append("Utilize tutoring services")
+            if not recs:
+                recs.append("Maintain current study habits")
+            recommendations.append(recs)
+        return recommendations
+
+    def _generate_recommendations_batch(self, X, risk_levels):
+        """Generate personalized recommendations for every row of X at once"""
+        flags = np.column_stack(
+            [X[:, index] < threshold for index, threshold, _ in RECOMMENDATION_RULES]
+        )
+        high_risk = np.asarray(risk_levels) == "high"
+
+        recommendations = []
+        for row_flags, is_high in zip(flags, high_risk):
+            row = [text for flagged, (_, _, text) in zip(row_flags, RECOMMENDATION_RULES) if flagged]
+            if is_high:
+                row.append("Schedule a meeting with your instructor")
+                row.append("Utilize tutoring services")
+            if not row:
+                row.append("Maintain current study habits")
+            recommendations.append(row)
         return recommendations
     
-    def load_model(self):
-        """Load trained model"""
-        try:
-            self.model = joblib.load('models/student_performance_model.pkl')
-            self.scaler = joblib.load('models/scaler.pkl')
+    def load_model(self, version=None):
+        """Load the current (or a given) model version from the registry"""
+        with self._load_lock:
+            if self.is_trained and version in (None, self.model_version):
+                return
+            if (version is None and self._missing_since is not None
+                    and time.monotonic() - self._missing_since < MISSING_MODEL_RETRY_SECONDS):
+                return
+            try:
+                version = version or registry.current_version()
+                if version is None:
+                    raise ModelRegistryError("No model version has been published")
+                manifest = registry.read_manifest(version)
+                # With the flat forest on disk the sklearn estimator isn't needed to serve,
+                # so skip unpickling it and share the memory-mapped arrays instead
+                has_flat_forest = FlatForest.has_artifacts(manifest["files"])
+                manifest, artifacts = registry.load(
+                    manifest["version"], exclude=("model.pkl",) if has_flat_forest else ()
+                )
+            except ModelRegistryError as e:
+                if version is not None or registry.current_version() is not None:
+                    print(f"❌ Model load failed: {e}")
+                    return
+                # Workers never train (they would race each other on CURRENT); publishing a
+                # model is train_model.py's job
+                if self._missing_since is None:
+                    print("❌ No published model found - run `python train_model.py` to publish one. "
+                          "Serving default predictions until then.")
+                self._missing_since = time.monotonic()
+                return
+
+            model = artifacts.get("model.pkl")
+            if has_flat_forest:
+                forest = FlatForest.from_artifacts(artifacts)
+            else:
+                forest = artifacts.get("forest.pkl")
+                if forest is None and manifest.get("engine_parity", True):
+                    forest = compile_forest(model)
+            self._install(model, artifacts["scaler.pkl"], forest, manifest["version"])
+            print(f"✅ Model {self.model_version} loaded successfully")
+
+    def _install(self, model, scaler, forest, version):
+        """Atomically swap in a new model version"""
+        with self._swap_lock:
+            self.model = model
+            self.scaler = scaler
+            self.forest = forest
+            self.model_version = version
             self.is_trained = True
-            print("✅ Model loaded successfully")
-        except FileNotFoundError:
-            print("❌ Model files not found. Training new model...")
-            self.train_model()
+            self._missing_since = None
+
+    def refresh_model(self):
+        """Load the version CURRENT names if it isn't the one being served"""
+        current = registry.current_version()
+        if current is not None and current != self.model_version:
+            self.load_model(current)
 
-# Global instance
+    async def follow_current(self, interval=MODEL_REFRESH_SECONDS):
+        """Background loop: refresh_model() every ``interval`` seconds"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await loop.run_in_executor(None, self.refresh_model)
+            except Exception as e:
+                print(f"❌ Model refresh failed: {e}")
+
+    async def retrain_async(self, incremental=False, window_days=None):
+        """Train and publish a new version in a separate process, then hot-swap to it"""
+        version = await run_in_subprocess(_train_in_worker, incremental, window_days)
+        if version is None:
+            return None
+        await asyncio.get_running_loop().run_in_executor(None, self.load_model, version)
+        return version
+
+    def warmup(self):
+        """Load the model on a background thread so the first request doesn't pay for it"""
+        thread = threading.Thread(target=self.load_model, name="model-warmup", daemon=True)
+        thread.start()
+        return thread
+
+# Global instance - the model is loaded lazily or by warmup(), never trained by the API
 performance_predictor = StudentPerformancePredictor()
 
-# Train model on startup
-performance_predictor.train_model()
\ No newline at end of file
+
+def _predict_many_in_worker(rows, version):
+    """Entry point for process-pool inference"""
+    if version is not None:
+        performance_predictor.load_model(version)
+    return performance_predictor.predict_many_with_version(rows)
+
+
+def _train_in_worker(incremental=False, window_days=None):
+    """Entry point for out-of-process retraining; returns the published version"""
+    if MODEL_RETRAIN_SOURCE == "synthetic":
+        predictor = StudentPerformancePredictor()
+        predictor.train_model()
+        return predictor.model_version
+
+    from .database import SessionLocal
+    from .training import train_from_database
+
+    db = SessionLocal()
+    try:
+        return train_from_database(db, incremental=incremental, window_days=window_days)
+    finally:
+        db.close()
+
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import uuid
+from datetime import datetime
+
+import joblib
+import numpy as np
+
+# Root directory holding one sub-directory per published model version
+MODEL_REGISTRY_DIR = os.environ.get("MODEL_REGISTRY_DIR", "models")
+MODEL_NAME = "student_performance"
+
+MANIFEST_FILE = "manifest.json"
+CURRENT_FILE = "CURRENT"
+
+
+class ModelRegistryError(Exception):
+    """Raised when a model version is missing or fails its checksum"""
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    """Versioned, checksummed model artifacts on disk.
+
+    Layout::
+
+        models/student_performance/
+            CURRENT                      -> name of the active version
+            20240101-120000-ab12cd/
+                manifest.json
+                model.pkl
+                scaler.pkl
+                forest.feature.npy ...   (flat forest arrays, see forest_engine.py)
+
+    A version directory is written under a temporary name and renamed into
+    place, and CURRENT is swapped with os.replace, so readers never see a
+    half-written version even when several processes publish at once.
+
+    NumPy arrays are stored as plain .npy files and opened with
+    ``mmap_mode='r'``, so every worker process maps the same pages from the
+    OS page cache instead of holding a private copy.
+    """
+
+    def __init__(self, root=MODEL_REGISTRY_DIR, name=MODEL_NAME):
+        self.base_dir = os.path.join(root, name)
+
+    def version_dir(self, version):
+        return os.path.join(self.base_dir, version)
+
+    def list_versions(self):
+        if not os.path.isdir(self.base_dir):
+            return []
+        return sorted(
+            entry for entry in os.listdir(self.base_dir)
+            if os.path.isfile(os.path.join(self.base_dir, entry, MANIFEST_FILE))
+        )
+
+    def current_version(self):
+        try:
+            with open(os.path.join(self.base_dir, CURRENT_FILE)) as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return None
+        return version or None
+
+    def read_manifest(self, version):
+        path = os.path.join(self.version_dir(version), MANIFEST_FILE)
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise ModelRegistryError(f"Model version {version} not found")
+
+    def publish(self, artifacts, metadata=None, make_current=True):
+        """Write a new version from {filename: object} and return its version id
+
+        ndarray values must use a .npy filename and are saved with np.save;
+        everything else is pickled with joblib.
+        """
+        os.makedirs(self.base_dir, exist_ok=True)
+        version = f"{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+        staging_dir = tempfile.mkdtemp(prefix=".staging-", dir=self.base_dir)
+        try:
+            files = {}
+            for filename, obj in artifacts.items():
+                path = os.path.join(staging_dir, filename)
+                if isinstance(obj, np.ndarray):
+                    if not filename.endswith(".npy"):
+                        raise ValueError(f"Array artifact {filename} must use a .npy filename")
+                    np.save(path, obj, allow_pickle=False)
+                else:
+                    joblib.dump(obj, path)
+                files[filename] = _sha256(path)
+
+            manifest = {
+                "name": os.path.basename(self.base_dir),
+                "version": version,
+                "created_at": datetime.utcnow().isoformat(),
+                "files": files,
+                **(metadata or {})
+            }
+            with open(os.path.join(staging_dir, MANIFEST_FILE), "w") as f:
+                json.dump(manifest, f, indent=2)
+
+            os.rename(staging_dir, self.version_dir(version))
+        except Exception:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            raise
+
+        if make_current:
+            self.set_current(version)
+        return version
+
+    def set_current(self, version):
+        """Atomically point CURRENT at an existing version"""
+        self.read_manifest(version)
+        fd, tmp_path = tempfile.mkstemp(prefix=".current-", dir=self.base_dir)
+        with os.fdopen(fd, "w") as f:
+            f.write(version)
+        os.replace(tmp_path, os.path.join(self.base_dir, CURRENT_FILE))
+
+    def load(self, version=None, exclude=()):
+        """Load and checksum-verify a version; returns (manifest, {filename: object})
+
+        .npy files come back as read-only memory maps. Files listed in
+        ``exclude`` are neither verified nor loaded.
+        """
+        version = version or self.current_version()
+        if version is None:
+            raise ModelRegistryError("No model version has been published")
+
+        manifest = self.read_manifest(version)
+        artifacts = {}
+        for filename, expected in manifest["files"].items():
+            if filename in exclude:
+                continue
+            path = os.path.join(self.version_dir(version), filename)
+            if _sha256(path) != expected:
+                raise ModelRegistryError(f"Checksum mismatch for {filename} in version {version}")
+            if filename.endswith(".npy"):
+                artifacts[filename] = np.load(path, mmap_mode="r", allow_pickle=False)
+            else:
+                artifacts[filename] = joblib.load(path)
+        return manifest, artifacts
+
+
+registry = ModelRegistry()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Float, Boolean, Date, DateTime, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -13,6 +13,8 @@ class User(Base):
     role = Column(String)  # "student", "teacher", or "alumni"
     full_name = Column(String)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Denormalized counter, maintained by counters.py
+    unread_messages = Column(Integer, nullable=False, default=0, server_default="0")
     
     # Relationships
     student_profile = relationship("Student", back_populates="user", uselist=False, cascade="all, delete-orphan")
@@ -29,7 +31,7 @@ class Student(Base):
     __tablename__ = "students"
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), unique=True, index=True)
     grade_level = Column(String)
     department = Column(String)
     
@@ -41,7 +43,7 @@ class Teacher(Base):
     __tablename__ = "teachers"
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), unique=True, index=True)
     department = Column(String)
     qualifications = Column(String)
     
@@ -52,7 +54,7 @@ class Alumni(Base):
     __tablename__ = "alumni"
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), unique=True, index=True)
     graduation_year = Column(Integer)
     degree = Column(String)
     current_company = Column(String)
@@ -69,8 +71,12 @@ class Course(Base):
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True)
     description = Column(Text)
-    teacher_id = Column(Integer, ForeignKey("teachers.id"))
+    teacher_id = Column(Integer, ForeignKey("teachers.id"), index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Denormalized counters, maintained by counters.py
+    student_count = Column(Integer, nullable=False, default=0, server_default="0")
+    assignment_count = Column(Integer, nullable=False, default=0, server_default="0")
+    resource_count = Column(Integer, nullable=False, default=0, server_default="0")
     
     teacher = relationship("Teacher", back_populates="courses")
     enrollments = relationship("Enrollment", back_populates="course")
@@ -79,16 +85,46 @@ class Course(Base):
 
 class Enrollment(Base):
     __tablename__ = "enrollments"
+    __table_args__ = (
+        Index("ux_enrollments_student_course", "student_id", "course_id", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     student_id = Column(Integer, ForeignKey("students.id"))
-    course_id = Column(Integer, ForeignKey("courses.id"))
+    course_id = Column(Integer, ForeignKey("courses.id"), index=True)
     enrolled_at = Column(DateTime(timezone=True), server_default=func.now())
     
     student = relationship("Student", back_populates="enrollments")
     course = relationship("Course", back_populates="enrollments")
     attendance = relationship("Attendance", back_populates="enrollment")
 
+class EnrollmentFeatures(Base):
+    """Materialized attendance/grade aggregates for the performance model (see features.py)"""
+    __tablename__ = "enrollment_features"
+    
+    enrollment_id = Column(Integer, ForeignKey("enrollments.id"), primary_key=True)
+    attendance_total = Column(Integer, default=0)
+    attendance_present = Column(Integer, default=0)
+    graded_count = Column(Integer, default=0)
+    grade_sum = Column(Float, default=0.0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class RiskScore(Base):
+    """Latest batch risk prediction per enrollment (see risk_scoring.py)"""
+    __tablename__ = "risk_scores"
+    
+    enrollment_id = Column(Integer, ForeignKey("enrollments.id"), primary_key=True)
+    course_id = Column(Integer, ForeignKey("courses.id"), index=True)
+    attendance_rate = Column(Float)
+    assignment_avg = Column(Float)
+    at_risk = Column(Boolean)
+    risk_probability = Column(Float)
+    risk_level = Column(String)
+    recommendations = Column(Text)  # JSON list
+    explanation = Column(Text, nullable=True)  # JSON {"base_risk", "contributions"}
+    model_version = Column(String, nullable=True)
+    scored_at = Column(DateTime(timezone=True), server_default=func.now())
+
 class Resource(Base):
     __tablename__ = "resources"
     
@@ -97,13 +133,16 @@ class Resource(Base):
     description = Column(Text)
     file_path = Column(String)
     resource_type = Column(String)  # pdf, video, note
-    course_id = Column(Integer, ForeignKey("courses.id"))
+    course_id = Column(Integer, ForeignKey("courses.id"), index=True)
     uploaded_at = Column(DateTime(timezone=True), server_default=func.now())
     
     course = relationship("Course", back_populates="resources")
 
 class Assignment(Base):
     __tablename__ = "assignments"
+    __table_args__ = (
+        Index("ix_assignments_course_due", "course_id", "due_date"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String)
@@ -117,6 +156,9 @@ class Assignment(Base):
 
 class AssignmentSubmission(Base):
     __tablename__ = "assignment_submissions"
+    __table_args__ = (
+        Index("ix_assignment_submissions_student_assignment", "student_id", "assignment_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     assignment_id = Column(Integer, ForeignKey("assignments.id"))
@@ -130,24 +172,34 @@ class AssignmentSubmission(Base):
     student = relationship("Student", back_populates="submissions")
 
 class Attendance(Base):
+    """One row per enrollment per session day; the unique key is also the lookup index"""
     __tablename__ = "attendance"
+    __table_args__ = (
+        Index("ux_attendance_enrollment_date", "enrollment_id", "date", unique=True),
+    )
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     enrollment_id = Column(Integer, ForeignKey("enrollments.id"))
-    date = Column(DateTime)
+    date = Column(Date)
     status = Column(String)  # present, absent, late
     
     enrollment = relationship("Enrollment", back_populates="attendance")
 
 class ChatConversation(Base):
     __tablename__ = "chat_conversations"
+    __table_args__ = (
+        Index("ix_chat_conversations_users", "user1_id", "user2_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user1_id = Column(Integer, ForeignKey("users.id"))
-    user2_id = Column(Integer, ForeignKey("users.id"))
+    user2_id = Column(Integer, ForeignKey("users.id"), index=True)
     last_message = Column(Text, nullable=True)
     last_message_time = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Unread messages addressed to user1 / user2, maintained by counters.py
+    user1_unread = Column(Integer, nullable=False, default=0, server_default="0")
+    user2_unread = Column(Integer, nullable=False, default=0, server_default="0")
     
     user1 = relationship("User", foreign_keys=[user1_id], back_populates="conversations_as_user1")
     user2 = relationship("User", foreign_keys=[user2_id], back_populates="conversations_as_user2")
@@ -155,6 +207,11 @@ class ChatConversation(Base):
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        # Keyset pagination of a conversation's history by id
+        Index("ix_chat_messages_conversation_id", "conversation_id", "id"),
+        Index("ix_chat_messages_receiver_unread", "receiver_id", "is_read"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     conversation_id = Column(Integer, ForeignKey("chat_conversations.id"))
@@ -166,4 +223,7 @@ class ChatMessage(Base):
     
     conversation = relationship("ChatConversation", back_populates="messages")
     sender = relationship("User", foreign_keys=[sender_id], back_populates="sent_messages")
-    receiver = relationship("User", foreign_keys=[receiver_id], back_populates="received_messages")
\ No newline at end of file
+    receiver = relationship("User", foreign_keys=[receiver_id], back_populates="received_messages")
+
+# Counter maintenance hooks must be active for every session that writes these models
+from . import counters  # noqa: E402,F401
@@ -0,0 +1,142 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from . import models
+
+PREDICTION_CACHE_SIZE = int(os.environ.get("PREDICTION_CACHE_SIZE", "10000"))
+# The cache is per process. Commits in the API invalidate it in every worker through the
+# chat backplane (CHAT_BACKPLANE_URL); without one, or for writes made outside the API
+# (scripts, other services), the other workers only catch up when entries expire
+PREDICTION_CACHE_TTL = float(os.environ.get("PREDICTION_CACHE_TTL", "900"))
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after ``ttl`` seconds"""
+
+    def __init__(self, maxsize=PREDICTION_CACHE_SIZE, ttl=PREDICTION_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, predicate):
+        """Drop every entry whose key matches predicate(key)"""
+        with self._lock:
+            for key in [key for key in self._data if predicate(key)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# Keys are (student_id, course_id, model_version)
+prediction_cache = TTLCache()
+
+
+def invalidate_student(student_id, course_id=None):
+    """Forget cached predictions for a student, optionally only for one course"""
+    prediction_cache.invalidate(
+        lambda key: key[0] == student_id and (course_id is None or key[1] == course_id)
+    )
+
+
+def apply_broadcast(event):
+    """Backplane on_broadcast callback: apply another worker's invalidations"""
+    if event.get("type") == "prediction_invalidations":
+        for student_id, course_id in event["keys"]:
+            invalidate_student(student_id, course_id)
+
+
+# (broadcast coroutine function, event loop) registered at startup
+_broadcaster = None
+_pending_broadcasts = set()
+
+
+def broadcast_invalidations(broadcast, loop):
+    """Send this worker's invalidations to the others with ``broadcast(event)`` on ``loop``"""
+    global _broadcaster
+    _broadcaster = (broadcast, loop) if broadcast is not None else None
+
+
+def _broadcast(invalidations):
+    if _broadcaster is None or not invalidations:
+        return
+    broadcast, loop = _broadcaster
+    event = {"type": "prediction_invalidations", "keys": [list(key) for key in invalidations]}
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        task = loop.create_task(broadcast(event))
+        _pending_broadcasts.add(task)
+        task.add_done_callback(_pending_broadcasts.discard)
+    elif not loop.is_closed():
+        # Committed on a worker thread (sync session)
+        asyncio.run_coroutine_threadsafe(broadcast(event), loop)
+
+
+# ------------------ INVALIDATION ON WRITES ------------------
+# Attendance and grade rows are the model inputs. Changes are collected at
+# flush time and applied only after the transaction commits, so a concurrent
+# reader can't re-cache the old values between flush and commit.
+
+@event.listens_for(Session, "before_flush")
+def _collect_prediction_invalidations(session, flush_context, instances):
+    pending = session.info.setdefault("prediction_invalidations", set())
+    with session.no_autoflush:
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            if isinstance(obj, models.AssignmentSubmission) and obj.student_id is not None:
+                # Invalidate every course of the student rather than resolving the assignment
+                pending.add((obj.student_id, None))
+            elif isinstance(obj, models.Attendance):
+                # Pending objects don't lazy-load relationships, so fall back to the FK
+                enrollment = obj.enrollment
+                if enrollment is None and obj.enrollment_id is not None:
+                    enrollment = session.get(models.Enrollment, obj.enrollment_id)
+                if enrollment is not None:
+                    pending.add((enrollment.student_id, enrollment.course_id))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_prediction_invalidations(session):
+    invalidations = session.info.pop("prediction_invalidations", ())
+    for student_id, course_id in invalidations:
+        invalidate_student(student_id, course_id)
+    _broadcast(invalidations)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_prediction_invalidations(session):
+    session.info.pop("prediction_invalidations", None)
@@ -0,0 +1,109 @@
+from collections import defaultdict
+from contextlib import contextmanager
+
+from sqlalchemy import and_, case, event, func, or_, select
+from sqlalchemy.orm import aliased, selectinload
+
+from . import models
+
+# Course, teacher and teacher's user for each enrollment, as three batched IN queries
+ENROLLMENT_COURSE_TEACHER = (
+    selectinload(models.Enrollment.course).selectinload(models.Course.teacher).selectinload(models.Teacher.user)
+)
+
+
+async def student_enrollments(db, student_id):
+    """A student's enrollments with course -> teacher -> user loaded up front"""
+    return (await db.scalars(
+        select(models.Enrollment).where(models.Enrollment.student_id == student_id)
+        .options(ENROLLMENT_COURSE_TEACHER).order_by(models.Enrollment.id)
+    )).all()
+
+
+async def rows_by_course(db, model, course_ids, limit_per_course=None, order_by=None):
+    """{course_id: [rows]} of a course-scoped model (Assignment, Resource, ...) in one IN query.
+
+    ``limit_per_course`` keeps the first N rows of each course (by ``order_by``,
+    default id) using ROW_NUMBER() instead of one LIMIT query per course.
+    """
+    grouped = defaultdict(list)
+    course_ids = list(set(course_ids))
+    if not course_ids:
+        return grouped
+
+    order = order_by if order_by is not None else model.id
+    if limit_per_course is None:
+        query = select(model).where(model.course_id.in_(course_ids)).order_by(model.course_id, order)
+    else:
+        ranked = select(
+            model, func.row_number().over(partition_by=model.course_id, order_by=order).label("position")
+        ).where(model.course_id.in_(course_ids)).subquery()
+        row = aliased(model, ranked)
+        query = select(row).where(ranked.c.position <= limit_per_course).order_by(
+            ranked.c.course_id, ranked.c.position
+        )
+
+    for item in (await db.scalars(query)).all():
+        grouped[item.course_id].append(item)
+    return grouped
+
+
+async def conversation_page(db, user_id, limit, before_time=None, before_id=None):
+    """(conversation, other participant, unread count for ``user_id``) rows in one query,
+    most recent message first; conversations without messages come last.
+
+    Pass the last row's ``last_message_time`` and ``id`` as ``before_time``/``before_id``
+    to get the next page.
+    """
+    conversation = models.ChatConversation
+    is_user1 = conversation.user1_id == user_id
+    other_user_id = case((is_user1, conversation.user2_id), else_=conversation.user1_id)
+    unread = case((is_user1, conversation.user1_unread), else_=conversation.user2_unread)
+
+    query = (
+        select(conversation, models.User, unread.label("unread_count"))
+        .join(models.User, models.User.id == other_user_id)
+        .where(or_(conversation.user1_id == user_id, conversation.user2_id == user_id))
+    )
+    if before_id is not None:
+        if before_time is None:
+            query = query.where(conversation.last_message_time.is_(None), conversation.id < before_id)
+        else:
+            query = query.where(or_(
+                conversation.last_message_time < before_time,
+                and_(conversation.last_message_time == before_time, conversation.id < before_id),
+                conversation.last_message_time.is_(None)
+            ))
+    query = query.order_by(conversation.last_message_time.desc().nulls_last(), conversation.id.desc())
+    return (await db.execute(query.limit(limit))).all()
+
+
+def conversation_to_dict(conversation, other_user, unread_count):
+    return {
+        "id": conversation.id,
+        "other_user": {
+            "id": other_user.id,
+            "full_name": other_user.full_name,
+            "username": other_user.username,
+            "role": other_user.role
+        },
+        "last_message": conversation.last_message,
+        "last_message_time": conversation.last_message_time,
+        "unread_count": unread_count
+    }
+
+
+@contextmanager
+def count_queries(engine):
+    """Count the SQL statements sent through ``engine`` (sync or async) inside the block"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(sync_engine, "before_cursor_execute", _record)
+    try:
+        yield statements
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", _record)
@@ -0,0 +1,142 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from sqlalchemy import delete, event, select
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import SessionLocal, upsert_insert
+from .features import get_features
+from .locks import acquire_file_lock
+from .ml_models import performance_predictor
+
+RISK_SCORING_CHUNK_SIZE = int(os.environ.get("RISK_SCORING_CHUNK_SIZE", "500"))
+# Seconds between in-process scoring runs; 0 disables the scheduler
+RISK_SCORING_INTERVAL = float(os.environ.get("RISK_SCORING_INTERVAL", "0"))
+# Only the worker holding this lock runs the scheduler, so a host's workers don't all
+# rescore the same rows. Per host: with several hosts, enable it on one of them
+RISK_SCORING_LOCK_FILE = os.environ.get(
+    "RISK_SCORING_LOCK_FILE", os.path.join(tempfile.gettempdir(), "eduhub-risk-scoring.lock")
+)
+
+
+SCORE_COLUMNS = ("course_id", "attendance_rate", "assignment_avg", "at_risk", "risk_probability",
+                 "risk_level", "recommendations", "explanation", "model_version", "scored_at")
+
+
+def store_risk_scores(db, enrollments, features, predictions, model_version):
+    """Upsert scores for (enrollment_id, course_id) pairs, stamped with the model version
+    that produced ``predictions``; the caller commits"""
+    if not enrollments:
+        return
+    scored_at = datetime.utcnow()
+    # ON CONFLICT rather than delete + insert: analytics views, ?fresh=true and the batch
+    # job may score the same enrollments concurrently
+    upsert = upsert_insert(db, models.RiskScore)
+    db.execute(upsert.on_conflict_do_update(
+        index_elements=[models.RiskScore.enrollment_id],
+        set_={column: upsert.excluded[column] for column in SCORE_COLUMNS}
+    ), [
+        {
+            "enrollment_id": enrollment_id,
+            "course_id": course_id,
+            "attendance_rate": features[enrollment_id]['attendance_rate'],
+            "assignment_avg": features[enrollment_id]['assignment_avg'],
+            "at_risk": prediction["at_risk"],
+            "risk_probability": prediction["risk_probability"],
+            "risk_level": prediction["risk_level"],
+            "recommendations": json.dumps(prediction["recommendations"]),
+            "explanation": json.dumps(prediction["explanation"]) if "explanation" in prediction else None,
+            "model_version": model_version,
+            "scored_at": scored_at
+        }
+        for (enrollment_id, course_id), prediction in zip(enrollments, predictions)
+    ])
+
+
+def score_enrollments(db, enrollments):
+    """Compute features and batch-score (enrollment_id, course_id) pairs, then store them"""
+    features = get_features(db, [enrollment_id for enrollment_id, _ in enrollments])
+    model_version, predictions = performance_predictor.predict_many_with_version(
+        [features[enrollment_id] for enrollment_id, _ in enrollments]
+    )
+    store_risk_scores(db, enrollments, features, predictions, model_version)
+    return features, predictions
+
+
+def run_batch_scoring(chunk_size=RISK_SCORING_CHUNK_SIZE, course_id=None):
+    """Score every enrollment (optionally one course) in id-ordered chunks"""
+    started = time.perf_counter()
+    performance_predictor.load_model()
+    db = SessionLocal()
+    scored = 0
+    last_id = 0
+    try:
+        while True:
+            query = select(models.Enrollment.id, models.Enrollment.course_id).where(
+                models.Enrollment.id > last_id
+            )
+            if course_id is not None:
+                query = query.where(models.Enrollment.course_id == course_id)
+            chunk = [tuple(row) for row in db.execute(
+                query.order_by(models.Enrollment.id).limit(chunk_size)
+            ).all()]
+            if not chunk:
+                break
+
+            score_enrollments(db, chunk)
+            db.commit()
+
+            scored += len(chunk)
+            last_id = chunk[-1][0]
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ Scored {scored} enrollments in {elapsed:.2f}s (model {performance_predictor.model_version})")
+    return scored
+
+
+def risk_score_to_dict(score):
+    result = {
+        "at_risk": score.at_risk,
+        "risk_probability": score.risk_probability,
+        "risk_level": score.risk_level,
+        "recommendations": json.loads(score.recommendations or "[]")
+    }
+    if score.explanation:
+        result["explanation"] = json.loads(score.explanation)
+    return result
+
+
+async def risk_scoring_scheduler(interval=RISK_SCORING_INTERVAL, lock_path=RISK_SCORING_LOCK_FILE):
+    """Background loop that re-runs batch scoring every ``interval`` seconds, in the one
+    worker that holds ``lock_path``; returns straight away in the others"""
+    leader = acquire_file_lock(lock_path, blocking=False)
+    if leader is None:
+        return
+    print(f"📌 Batch risk scoring every {interval:g}s in this worker (pid {os.getpid()})")
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            try:
+                await loop.run_in_executor(None, run_batch_scoring)
+            except Exception as e:
+                print(f"❌ Batch risk scoring failed: {e}")
+            await asyncio.sleep(interval)
+    finally:
+        leader.close()
+
+
+@event.listens_for(Session, "before_flush")
+def _drop_scores_of_deleted_enrollments(session, flush_context, instances):
+    deleted = [obj.id for obj in session.deleted if isinstance(obj, models.Enrollment)]
+    if deleted:
+        session.execute(delete(models.RiskScore).where(models.RiskScore.enrollment_id.in_(deleted)))
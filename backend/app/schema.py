@@ -0,0 +1,152 @@
+import os
+import tempfile
+
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from sqlalchemy import inspect, text
+
+from . import models
+from .database import engine
+from .locks import file_lock
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ALEMBIC_INI = os.path.join(BACKEND_DIR, "alembic.ini")
+# Revision matching the schema create_all() used to build, before migrations existed
+BASELINE_REVISION = "0001"
+
+# Upgrade the schema when the API starts. Every worker does it at import, so upgrades are
+# serialized: through MIGRATION_LOCK_FILE between workers on one host, and through a
+# PostgreSQL advisory lock between hosts. The first worker migrates, the rest find the
+# schema at head. AUTO_MIGRATE=0 leaves it to `python migrate.py` as a deploy step.
+AUTO_MIGRATE = os.environ.get("AUTO_MIGRATE", "1") == "1"
+MIGRATION_LOCK_FILE = os.environ.get(
+    "MIGRATION_LOCK_FILE", os.path.join(tempfile.gettempdir(), "eduhub-migrate.lock")
+)
+# Arbitrary application-wide key for pg_advisory_lock
+MIGRATION_ADVISORY_LOCK_KEY = 720_341_001
+
+# Queries on the request path that must be answered from an index: (name, sql, params)
+HOT_QUERIES = [
+    ("student by user", "SELECT * FROM students WHERE user_id = :id", {"id": 1}),
+    ("teacher by user", "SELECT * FROM teachers WHERE user_id = :id", {"id": 1}),
+    ("alumni by user", "SELECT * FROM alumni WHERE user_id = :id", {"id": 1}),
+    ("courses by teacher", "SELECT * FROM courses WHERE teacher_id = :id", {"id": 1}),
+    ("enrollment by student and course",
+     "SELECT * FROM enrollments WHERE student_id = :student AND course_id = :course",
+     {"student": 1, "course": 1}),
+    ("enrollments by course", "SELECT * FROM enrollments WHERE course_id = :id", {"id": 1}),
+    ("attendance by enrollment", "SELECT * FROM attendance WHERE enrollment_id = :id", {"id": 1}),
+    ("resources by course", "SELECT * FROM resources WHERE course_id = :id", {"id": 1}),
+    ("assignments by course, by due date",
+     "SELECT * FROM assignments WHERE course_id = :id ORDER BY due_date", {"id": 1}),
+    ("submissions by student and assignment",
+     "SELECT * FROM assignment_submissions WHERE student_id = :student AND assignment_id = :assignment",
+     {"student": 1, "assignment": 1}),
+    ("conversation between two users",
+     "SELECT * FROM chat_conversations WHERE (user1_id = :a AND user2_id = :b) "
+     "OR (user1_id = :b AND user2_id = :a)", {"a": 1, "b": 2}),
+    ("conversations of a user",
+     "SELECT * FROM chat_conversations WHERE user1_id = :id OR user2_id = :id", {"id": 1}),
+    ("page of a conversation's messages, newest first",
+     "SELECT * FROM chat_messages WHERE conversation_id = :id AND id < :before ORDER BY id DESC LIMIT 50",
+     {"id": 1, "before": 1000}),
+    ("unread messages of a user",
+     "SELECT COUNT(id) FROM chat_messages WHERE receiver_id = :id AND is_read = :is_read",
+     {"id": 1, "is_read": False}),
+]
+
+
+def alembic_config(connection=None):
+    """Alembic config for this backend; ``connection`` is reused by migrations/env.py"""
+    config = Config(ALEMBIC_INI)
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "migrations"))
+    if connection is not None:
+        config.attributes["connection"] = connection
+    return config
+
+
+def upgrade_database(bind=engine, revision="head", lock_path=MIGRATION_LOCK_FILE):
+    """Bring the schema up to ``revision``.
+
+    Concurrent upgrades (several workers starting at once) run one after
+    another under MIGRATION_LOCK_FILE and, on PostgreSQL, an advisory lock.
+
+    Databases created by create_all() have tables but no alembic_version:
+    missing tables are added and the database is stamped at head if it
+    already matches the models, otherwise at the baseline revision, so only
+    the later revisions run.
+    """
+    with file_lock(lock_path), bind.connect() as connection:
+        advisory = connection.dialect.name == "postgresql"
+        if advisory:
+            # Session-level, so it is held across the commits below until unlocked
+            connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_ADVISORY_LOCK_KEY})
+            connection.commit()
+        try:
+            _upgrade(connection, revision)
+        finally:
+            if advisory:
+                connection.rollback()
+                connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_ADVISORY_LOCK_KEY})
+                connection.commit()
+
+
+def _upgrade(connection, revision):
+    tables = set(inspect(connection).get_table_names())
+    legacy = bool(tables) and "alembic_version" not in tables
+    if legacy:
+        models.Base.metadata.create_all(bind=connection)
+    connection.commit()
+
+    config = alembic_config(connection)
+    if legacy:
+        # create_all() from the current models already produced the latest schema
+        up_to_date = not compare_metadata(MigrationContext.configure(connection), models.Base.metadata)
+        connection.commit()
+        adopted = "head" if up_to_date else BASELINE_REVISION
+        print(f"📌 Adopting existing database at revision {adopted}")
+        command.stamp(config, adopted)
+    command.upgrade(config, revision)
+
+
+def current_revision(bind=engine):
+    with bind.connect() as connection:
+        if not inspect(connection).has_table("alembic_version"):
+            return None
+        return connection.execute(text("SELECT version_num FROM alembic_version")).scalar()
+
+
+def _query_plan(connection, sql, params):
+    if connection.dialect.name == "sqlite":
+        rows = connection.execute(text(f"EXPLAIN QUERY PLAN {sql}"), params).all()
+        return [row[-1] for row in rows]
+    return [row[0] for row in connection.execute(text(f"EXPLAIN {sql}"), params).all()]
+
+
+def _uses_index(plan, dialect):
+    if dialect == "sqlite":
+        # "SCAN t" is a full table scan; "SCAN t USING INDEX ..." walks an index.
+        # A temp b-tree means the rows had to be sorted after being found.
+        return not any((line.startswith("SCAN") and "INDEX" not in line) or "TEMP B-TREE" in line
+                       for line in plan)
+    return not any("Seq Scan" in line for line in plan)
+
+
+def check_hot_path_indexes(bind=engine, queries=HOT_QUERIES):
+    """EXPLAIN every hot query; returns [(name, uses_index, plan lines)].
+
+    Planners prefer a full scan on tiny tables, so on PostgreSQL sequential
+    scans are disabled for the check; an index that can serve the query is
+    then always chosen.
+    """
+    results = []
+    with bind.connect() as connection:
+        if connection.dialect.name == "postgresql":
+            connection.execute(text("SET LOCAL enable_seqscan = off"))
+        for name, sql, params in queries:
+            plan = _query_plan(connection, sql, params)
+            results.append((name, _uses_index(plan, connection.dialect.name), plan))
+        connection.rollback()
+    return results
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional, List
-from datetime import datetime
+from typing import Optional, List, Literal
+from datetime import date, datetime
 
 class Token(BaseModel):
     access_token: str
@@ -177,4 +177,13 @@ class ChatMessage(ChatMessageBase):
     created_at: datetime
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class AttendanceRecord(BaseModel):
+    student_id: int
+    status: Literal["present", "absent", "late"]
+
+class AttendanceSheet(BaseModel):
+    course_id: int
+    date: date
+    records: List[AttendanceRecord]
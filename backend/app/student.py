@@ -1,70 +1,59 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from typing import List
 
 # Relative imports
 from . import models
 from .auth import get_current_active_user
-from .database import get_db
+from .database import get_read_db
+from .instrumentation import query_budget
 from .ml_models import performance_predictor
+from .features import get_features, get_primary_enrollment_features
+from .prediction_cache import prediction_cache
+from .queries import student_enrollments, rows_by_course
 import numpy as np
 
 router = APIRouter(prefix="/student", tags=["student"])
 
 @router.get("/dashboard")
+@query_budget(13)
 async def get_student_dashboard(
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     if current_user.role != "student":
         raise HTTPException(status_code=403, detail="Not authorized")
     
     # Get student profile
-    student = db.query(models.Student).filter(models.Student.user_id == current_user.id).first()
+    student = await db.scalar(select(models.Student).where(models.Student.user_id == current_user.id))
     if not student:
         raise HTTPException(status_code=404, detail="Student profile not found")
     
-    # Get enrollments
-    enrollments = db.query(models.Enrollment).filter(models.Enrollment.student_id == student.id).all()
+    # Get enrollments, with course and teacher loaded up front (no lazy loads on AsyncSession)
+    enrollments = await student_enrollments(db, student.id)
     
-    # Get recent assignments
-    recent_assignments = []
-    for enrollment in enrollments:
-        assignments = db.query(models.Assignment).filter(
-            models.Assignment.course_id == enrollment.course_id
-        ).limit(5).all()
-        for assignment in assignments:
-            recent_assignments.append(assignment)
-    
-    # Calculate attendance
-    attendance_data = []
-    for enrollment in enrollments:
-        attendance_records = db.query(models.Attendance).filter(
-            models.Attendance.enrollment_id == enrollment.id
-        ).all()
-        if attendance_records:
-            present_count = sum(1 for record in attendance_records if record.status == "present")
-            attendance_rate = present_count / len(attendance_records)
-            attendance_data.append({
-                "course_id": enrollment.course_id,
-                "course_title": enrollment.course.title,
-                "attendance_rate": attendance_rate
-            })
-        else:
-            # Default attendance if no records
-            attendance_data.append({
-                "course_id": enrollment.course_id,
-                "course_title": enrollment.course.title,
-                "attendance_rate": 0.85
-            })
+    # Get recent assignments: up to 5 per course, for all courses in one query
+    assignments_by_course = await rows_by_course(
+        db, models.Assignment, [enrollment.course_id for enrollment in enrollments], limit_per_course=5
+    )
+    recent_assignments = [
+        assignment
+        for enrollment in enrollments
+        for assignment in assignments_by_course[enrollment.course_id]
+    ]
     
-    # If no attendance data, create some default data
-    if not attendance_data and enrollments:
-        attendance_data = [{
+    # Calculate attendance from the feature store in one query
+    features = await db.run_sync(get_features, [enrollment.id for enrollment in enrollments])
+    attendance_data = [
+        {
             "course_id": enrollment.course_id,
             "course_title": enrollment.course.title,
-            "attendance_rate": 0.85
-        } for enrollment in enrollments]
+            "attendance_rate": features[enrollment.id]['attendance_rate']
+        }
+        for enrollment in enrollments
+    ]
     
     return {
         "student": {
@@ -112,24 +101,28 @@ async def get_student_dashboard(
     }
 
 @router.get("/courses")
+@query_budget(8)
 async def get_student_courses(
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     if current_user.role != "student":
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    student = db.query(models.Student).filter(models.Student.user_id == current_user.id).first()
+    student = await db.scalar(select(models.Student).where(models.Student.user_id == current_user.id))
     if not student:
         raise HTTPException(status_code=404, detail="Student profile not found")
         
-    enrollments = db.query(models.Enrollment).filter(models.Enrollment.student_id == student.id).all()
+    enrollments = await student_enrollments(db, student.id)
+    course_ids = [enrollment.course_id for enrollment in enrollments]
+    resources_by_course = await rows_by_course(db, models.Resource, course_ids)
+    assignments_by_course = await rows_by_course(db, models.Assignment, course_ids)
     
     courses = []
     for enrollment in enrollments:
         course = enrollment.course
-        resources = db.query(models.Resource).filter(models.Resource.course_id == course.id).all()
-        assignments = db.query(models.Assignment).filter(models.Assignment.course_id == course.id).all()
+        resources = resources_by_course[course.id]
+        assignments = assignments_by_course[course.id]
         
         courses.append({
             "course": {
@@ -167,78 +160,64 @@ async def get_student_courses(
     return courses
 
 @router.get("/performance/{course_id}")
+@query_budget(9)
 async def get_student_performance(
     course_id: int,
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     if current_user.role != "student":
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    student = db.query(models.Student).filter(models.Student.user_id == current_user.id).first()
+    student = await db.scalar(select(models.Student).where(models.Student.user_id == current_user.id))
     if not student:
         raise HTTPException(status_code=404, detail="Student profile not found")
         
-    enrollment = db.query(models.Enrollment).filter(
+    enrollment = await db.scalar(select(models.Enrollment).where(
         models.Enrollment.student_id == student.id,
         models.Enrollment.course_id == course_id
-    ).first()
+    ))
     
     if not enrollment:
         raise HTTPException(status_code=404, detail="Enrollment not found")
     
-    # Get attendance data
-    attendance_records = db.query(models.Attendance).filter(
-        models.Attendance.enrollment_id == enrollment.id
-    ).all()
+    # Serve repeated views from the cache; it is invalidated on attendance/grade writes
+    cached = prediction_cache.get((student.id, course_id, performance_predictor.model_version))
+    if cached is not None:
+        return cached
     
-    if attendance_records:
-        present_count = sum(1 for record in attendance_records if record.status == "present")
-        attendance_rate = present_count / len(attendance_records)
-    else:
-        attendance_rate = 0.85
-    
-    # Get assignment grades
-    submissions = db.query(models.AssignmentSubmission).filter(
-        models.AssignmentSubmission.student_id == student.id
-    ).all()
-    
-    if submissions:
-        assignment_avg = sum(s.grade for s in submissions if s.grade) / len(submissions) if submissions else 85.0
-    else:
-        assignment_avg = 85.0
-    
-    student_data = {
-        'attendance_rate': attendance_rate,
-        'assignment_avg': assignment_avg,
-        'participation_score': 7.5,
-        'previous_grades': 85.0,
-        'study_hours': 12.0
-    }
+    # Attendance and course-scoped grade aggregates from the feature store, read from the
+    # primary because the result is cached
+    student_data = await db.run_sync(get_primary_enrollment_features, enrollment.id)
     
     # Get prediction
-    prediction = performance_predictor.predict_student_risk(student_data)
+    prediction = await performance_predictor.predict_student_risk_async(student_data)
     
-    return {
+    result = {
         "student_data": student_data,
         "prediction": prediction
     }
+    # Don't pin a timeout/overload fallback in the cache
+    if not prediction.get("fallback"):
+        prediction_cache.set((student.id, course_id, performance_predictor.model_version), result)
+    return result
 
 @router.get("/assignments")
+@query_budget(3)
 async def get_student_assignments(
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     if current_user.role != "student":
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    student = db.query(models.Student).filter(models.Student.user_id == current_user.id).first()
+    student = await db.scalar(select(models.Student).where(models.Student.user_id == current_user.id))
     if not student:
         raise HTTPException(status_code=404, detail="Student profile not found")
         
-    submissions = db.query(models.AssignmentSubmission).filter(
+    submissions = (await db.scalars(select(models.AssignmentSubmission).where(
         models.AssignmentSubmission.student_id == student.id
-    ).all()
+    ).options(selectinload(models.AssignmentSubmission.assignment)))).all()
     
     return [
         {
@@ -254,33 +233,34 @@ async def get_student_assignments(
     ]
 
 @router.get("/course-resources")
+@query_budget(5)
 async def get_course_resources(
     course_id: int = Query(...),
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     if current_user.role != "student":
         raise HTTPException(status_code=403, detail="Not authorized")
     
     # Verify student is enrolled in this course
-    student = db.query(models.Student).filter(models.Student.user_id == current_user.id).first()
+    student = await db.scalar(select(models.Student).where(models.Student.user_id == current_user.id))
     if not student:
         raise HTTPException(status_code=404, detail="Student profile not found")
     
-    enrollment = db.query(models.Enrollment).filter(
+    enrollment = await db.scalar(select(models.Enrollment).where(
         models.Enrollment.student_id == student.id,
         models.Enrollment.course_id == course_id
-    ).first()
+    ))
     
     if not enrollment:
         raise HTTPException(status_code=403, detail="Not enrolled in this course")
     
     # Get course and resources
-    course = db.query(models.Course).filter(models.Course.id == course_id).first()
+    course = await db.get(models.Course, course_id)
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
     
-    resources = db.query(models.Resource).filter(models.Resource.course_id == course_id).all()
+    resources = (await db.scalars(select(models.Resource).where(models.Resource.course_id == course_id))).all()
     
     return {
         "course": {
@@ -1,13 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query
-from sqlalchemy.orm import Session
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from typing import List, Optional
 
 # Relative imports
 from . import models
 from . import schemas
 from .auth import get_current_active_user
-from .database import get_db
+from .bulk import MAX_BULK_ROWS, bulk_enroll, parse_roster_csv, record_attendance
+from .database import get_async_db, get_read_db
+from .instrumentation import query_budget
 from .ml_models import performance_predictor
+from .features import get_features
+from .risk_scoring import store_risk_scores, risk_score_to_dict
+from datetime import datetime
 import shutil
 import os
 import numpy as np
@@ -15,35 +23,35 @@ import numpy as np
 router = APIRouter(prefix="/teacher", tags=["teacher"])
 
 @router.get("/dashboard")
+@query_budget(3)
 async def get_teacher_dashboard(
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     if current_user.role != "teacher":
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    teacher = db.query(models.Teacher).filter(models.Teacher.user_id == current_user.id).first()
+    teacher = await db.scalar(select(models.Teacher).where(models.Teacher.user_id == current_user.id))
     if not teacher:
         raise HTTPException(status_code=404, detail="Teacher profile not found")
         
-    courses = db.query(models.Course).filter(models.Course.teacher_id == teacher.id).all()
+    # Counts are maintained counter columns, so this is a single indexed read
+    courses = (await db.scalars(select(models.Course).where(models.Course.teacher_id == teacher.id)
+                                .order_by(models.Course.id))).all()
     
-    course_data = []
-    for course in courses:
-        enrollments = db.query(models.Enrollment).filter(models.Enrollment.course_id == course.id).all()
-        assignments = db.query(models.Assignment).filter(models.Assignment.course_id == course.id).all()
-        resources = db.query(models.Resource).filter(models.Resource.course_id == course.id).all()
-        
-        course_data.append({
+    course_data = [
+        {
             "course": {
                 "id": course.id,
                 "title": course.title,
                 "description": course.description
             },
-            "student_count": len(enrollments),
-            "assignment_count": len(assignments),
-            "resource_count": len(resources)
-        })
+            "student_count": course.student_count,
+            "assignment_count": course.assignment_count,
+            "resource_count": course.resource_count
+        }
+        for course in courses
+    ]
     
     return {
         "teacher": {
@@ -65,12 +73,12 @@ async def get_teacher_dashboard(
 async def create_course(
     course: schemas.CourseCreate,
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     if current_user.role != "teacher":
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    teacher = db.query(models.Teacher).filter(models.Teacher.user_id == current_user.id).first()
+    teacher = await db.scalar(select(models.Teacher).where(models.Teacher.user_id == current_user.id))
     if not teacher:
         raise HTTPException(status_code=404, detail="Teacher profile not found")
     
@@ -81,8 +89,8 @@ async def create_course(
     )
     
     db.add(db_course)
-    db.commit()
-    db.refresh(db_course)
+    await db.commit()
+    await db.refresh(db_course)
     
     return db_course
 
@@ -94,7 +102,7 @@ async def upload_resource(
     resource_type: str = Form("pdf"),
     course_id: int = Form(...),
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     if current_user.role != "teacher":
         raise HTTPException(status_code=403, detail="Not authorized")
@@ -116,8 +124,8 @@ async def upload_resource(
     )
     
     db.add(resource)
-    db.commit()
-    db.refresh(resource)
+    await db.commit()
+    await db.refresh(resource)
     
     return resource
 
@@ -125,21 +133,21 @@ async def upload_resource(
 async def delete_resource(
     resource_id: int,
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     if current_user.role != "teacher":
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    resource = db.query(models.Resource).filter(models.Resource.id == resource_id).first()
+    resource = await db.scalar(select(models.Resource).where(models.Resource.id == resource_id))
     if not resource:
         raise HTTPException(status_code=404, detail="Resource not found")
     
     # Verify the teacher owns this course
-    course = db.query(models.Course).filter(models.Course.id == resource.course_id).first()
+    course = await db.scalar(select(models.Course).where(models.Course.id == resource.course_id))
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
     
-    teacher = db.query(models.Teacher).filter(models.Teacher.user_id == current_user.id).first()
+    teacher = await db.scalar(select(models.Teacher).where(models.Teacher.user_id == current_user.id))
     if course.teacher_id != teacher.id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this resource")
     
@@ -151,96 +159,150 @@ async def delete_resource(
         print(f"Warning: Could not delete file {resource.file_path}: {e}")
     
     # Delete from database
-    db.delete(resource)
-    db.commit()
+    await db.delete(resource)
+    await db.commit()
     
     return {"message": "Resource deleted successfully"}
 
 @router.get("/analytics/{course_id}")
+@query_budget(11)
 async def get_course_analytics(
     course_id: int,
+    fresh: bool = Query(False),
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     if current_user.role != "teacher":
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    course = db.query(models.Course).filter(models.Course.id == course_id).first()
+    course = await db.scalar(select(models.Course).where(models.Course.id == course_id))
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
     
-    enrollments = db.query(models.Enrollment).filter(models.Enrollment.course_id == course_id).all()
+    # Roster, student details and stored batch scores in one indexed read
+    rows = (await db.execute(select(models.Enrollment.id, models.User, models.RiskScore).join(
+        models.Student, models.Student.id == models.Enrollment.student_id
+    ).join(
+        models.User, models.User.id == models.Student.user_id
+    ).outerjoin(
+        models.RiskScore, models.RiskScore.enrollment_id == models.Enrollment.id
+    ).where(models.Enrollment.course_id == course_id).order_by(models.Enrollment.id))).all()
+    
+    # Score live on ?fresh=true, or for enrollments the batch job hasn't reached yet
+    live_ids = [enrollment_id for enrollment_id, _, score in rows if fresh or score is None]
+    live = {}
+    if live_ids:
+        features = await db.run_sync(get_features, live_ids)
+        live_version, predictions = await performance_predictor.predict_many_with_version_async(
+            [features[enrollment_id] for enrollment_id in live_ids]
+        )
+        live = {
+            enrollment_id: (features[enrollment_id], prediction)
+            for enrollment_id, prediction in zip(live_ids, predictions)
+        }
+        scored = [enrollment_id for enrollment_id in live_ids if not live[enrollment_id][1].get("fallback")]
+        await db.run_sync(
+            store_risk_scores,
+            [(enrollment_id, course_id) for enrollment_id in scored],
+            features,
+            [live[enrollment_id][1] for enrollment_id in scored],
+            live_version
+        )
     
     analytics_data = []
-    for enrollment in enrollments:
-        student = enrollment.student
-        
-        # Mock data for demonstration
-        student_data = {
-            'attendance_rate': 0.85,
-            'assignment_avg': 78.5,
-            'participation_score': 6.0,
-            'previous_grades': 80.0,
-            'study_hours': 10.0
-        }
-        
-        prediction = performance_predictor.predict_student_risk(student_data)
+    for enrollment_id, user, score in rows:
+        if enrollment_id in live:
+            student_data, prediction = live[enrollment_id]
+            attendance_rate = student_data['attendance_rate']
+            assignment_avg = student_data['assignment_avg']
+            model_version = live_version
+            scored_at = datetime.utcnow()
+        else:
+            prediction = risk_score_to_dict(score)
+            attendance_rate = score.attendance_rate
+            assignment_avg = score.assignment_avg
+            model_version = score.model_version
+            scored_at = score.scored_at
         
         analytics_data.append({
             "student": {
-                "id": student.user.id,
-                "username": student.user.username,
-                "full_name": student.user.full_name,
-                "email": student.user.email
+                "id": user.id,
+                "username": user.username,
+                "full_name": user.full_name,
+                "email": user.email
             },
-            "attendance_rate": student_data['attendance_rate'],
-            "assignment_avg": student_data['assignment_avg'],
-            "risk_prediction": prediction
+            "attendance_rate": attendance_rate,
+            "assignment_avg": assignment_avg,
+            "risk_prediction": prediction,
+            "model_version": model_version,
+            "scored_at": scored_at.isoformat() if scored_at else None
         })
     
-    return {
+    if live_ids:
+        await db.commit()
+    
+    # Everything above is already JSON-native, so skip FastAPI's generic (slow) encoder
+    return JSONResponse({
         "course": {
             "id": course.id,
             "title": course.title,
             "description": course.description
         },
         "analytics": analytics_data
-    }
+    })
+
+@router.post("/model/retrain")
+async def retrain_model(
+    incremental: bool = False,
+    window_days: Optional[int] = Query(None, ge=1),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    if current_user.role != "teacher":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    # Trains on the database history in a separate process (MODEL_RETRAIN_SOURCE); the
+    # new version is swapped in when it is published
+    version = await performance_predictor.retrain_async(incremental=incremental, window_days=window_days)
+    if version is None:
+        raise HTTPException(status_code=500, detail="Model training failed")
+    
+    return {"message": "Model retrained successfully", "model_version": version}
 
 @router.post("/assignments")
 async def create_assignment(
     assignment: schemas.AssignmentCreate,
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     if current_user.role != "teacher":
         raise HTTPException(status_code=403, detail="Not authorized")
     
     db_assignment = models.Assignment(**assignment.dict())
     db.add(db_assignment)
-    db.commit()
-    db.refresh(db_assignment)
+    await db.commit()
+    await db.refresh(db_assignment)
     
     return db_assignment
 
 @router.get("/resources")
+@query_budget(4)
 async def get_course_resources(
     course_id: int = Query(...),
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     if current_user.role != "teacher":
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    course = db.query(models.Course).filter(models.Course.id == course_id).first()
+    course = await db.scalar(select(models.Course).where(models.Course.id == course_id))
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
     
     # Verify the teacher owns this course
-    if course.teacher_id != db.query(models.Teacher).filter(models.Teacher.user_id == current_user.id).first().id:
+    if course.teacher_id != (await db.scalar(select(models.Teacher).where(models.Teacher.user_id == current_user.id))).id:
         raise HTTPException(status_code=403, detail="Not authorized to view this course's resources")
     
-    resources = db.query(models.Resource).filter(models.Resource.course_id == course_id).all()
+    resources = (await db.scalars(select(models.Resource).where(models.Resource.course_id == course_id))).all()
     return {
         "course": {
             "id": course.id,
@@ -261,18 +323,19 @@ async def get_course_resources(
     }
 
 @router.get("/courses")
+@query_budget(3)
 async def get_teacher_courses(
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     if current_user.role != "teacher":
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    teacher = db.query(models.Teacher).filter(models.Teacher.user_id == current_user.id).first()
+    teacher = await db.scalar(select(models.Teacher).where(models.Teacher.user_id == current_user.id))
     if not teacher:
         raise HTTPException(status_code=404, detail="Teacher profile not found")
         
-    courses = db.query(models.Course).filter(models.Course.teacher_id == teacher.id).all()
+    courses = (await db.scalars(select(models.Course).where(models.Course.teacher_id == teacher.id))).all()
     return [
         {
             "id": course.id,
@@ -284,14 +347,15 @@ async def get_teacher_courses(
     ]
 
 @router.get("/all-students")
+@query_budget(3)
 async def get_all_students(
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     if current_user.role != "teacher":
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    students = db.query(models.Student).all()
+    students = (await db.scalars(select(models.Student).options(selectinload(models.Student.user)))).all()
     return [
         {
             "id": student.id,
@@ -308,30 +372,30 @@ async def enroll_student(
     course_id: int = Form(...),
     student_id: int = Form(...),
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     if current_user.role != "teacher":
         raise HTTPException(status_code=403, detail="Not authorized")
     
     # Verify teacher owns the course
-    course = db.query(models.Course).filter(models.Course.id == course_id).first()
+    course = await db.scalar(select(models.Course).where(models.Course.id == course_id))
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
     
-    teacher = db.query(models.Teacher).filter(models.Teacher.user_id == current_user.id).first()
+    teacher = await db.scalar(select(models.Teacher).where(models.Teacher.user_id == current_user.id))
     if course.teacher_id != teacher.id:
         raise HTTPException(status_code=403, detail="Not authorized to enroll students in this course")
     
     # Check if student exists
-    student = db.query(models.Student).filter(models.Student.id == student_id).first()
+    student = await db.scalar(select(models.Student).where(models.Student.id == student_id))
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
     
     # Check if already enrolled
-    existing = db.query(models.Enrollment).filter(
+    existing = await db.scalar(select(models.Enrollment).where(
         models.Enrollment.course_id == course_id,
         models.Enrollment.student_id == student_id
-    ).first()
+    ))
     
     if existing:
         raise HTTPException(status_code=400, detail="Student already enrolled in this course")
@@ -343,33 +407,112 @@ async def enroll_student(
     )
     
     db.add(enrollment)
-    db.commit()
-    db.refresh(enrollment)
+    await db.commit()
+    await db.refresh(enrollment)
     
     return {"message": f"Student enrolled successfully", "enrollment_id": enrollment.id}
 
+@router.post("/enroll-students")
+@query_budget(6)
+async def enroll_students(
+    course_id: int = Form(...),
+    student_ids: List[int] = Form([]),
+    file: Optional[UploadFile] = File(None),
+    current_user: models.User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Enroll a whole roster: repeated ``student_ids`` fields and/or a CSV of usernames or emails"""
+    if current_user.role != "teacher":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    identifiers = []
+    if file is not None:
+        try:
+            identifiers = parse_roster_csv((await file.read()).decode("utf-8-sig"))
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=400, detail="Roster file must be UTF-8 CSV")
+    if not student_ids and not identifiers:
+        raise HTTPException(status_code=400, detail="No students given")
+    if len(student_ids) + len(identifiers) > MAX_BULK_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_ROWS} students per request")
+
+    # Verify teacher owns the course
+    owner_id = await db.scalar(select(models.Teacher.user_id).join(
+        models.Course, models.Course.teacher_id == models.Teacher.id
+    ).where(models.Course.id == course_id))
+    if owner_id is None:
+        raise HTTPException(status_code=404, detail="Course not found")
+    if owner_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized to enroll students in this course")
+
+    results = await db.run_sync(bulk_enroll, course_id, student_ids, identifiers)
+    await db.commit()
+
+    summary = {status: 0 for status in ("enrolled", "already_enrolled", "not_found", "duplicate")}
+    for result in results:
+        summary[result["status"]] += 1
+    return {"course_id": course_id, **summary, "results": results}
+
+@router.post("/attendance")
+@query_budget(8)
+async def record_course_attendance(
+    sheet: schemas.AttendanceSheet,
+    current_user: models.User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Record (or correct) a whole session's attendance for a course in one request"""
+    if current_user.role != "teacher":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    if len(sheet.records) > MAX_BULK_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_ROWS} records per request")
+
+    # Verify teacher owns the course
+    owner_id = await db.scalar(select(models.Teacher.user_id).join(
+        models.Course, models.Course.teacher_id == models.Teacher.id
+    ).where(models.Course.id == sheet.course_id))
+    if owner_id is None:
+        raise HTTPException(status_code=404, detail="Course not found")
+    if owner_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized to record attendance for this course")
+
+    results = await db.run_sync(
+        record_attendance, sheet.course_id, sheet.date,
+        [(record.student_id, record.status) for record in sheet.records]
+    )
+    await db.commit()
+
+    recorded = sum(result["status"] == "recorded" for result in results)
+    return {
+        "course_id": sheet.course_id,
+        "date": sheet.date,
+        "recorded": recorded,
+        "not_enrolled": len(results) - recorded,
+        "results": results
+    }
+
 @router.get("/course/{course_id}/enrolled-students")
+@query_budget(4)
 async def get_enrolled_students(
     course_id: int,
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     if current_user.role != "teacher":
         raise HTTPException(status_code=403, detail="Not authorized")
     
     # Verify teacher owns the course
-    course = db.query(models.Course).filter(models.Course.id == course_id).first()
+    course = await db.scalar(select(models.Course).where(models.Course.id == course_id))
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
     
-    teacher = db.query(models.Teacher).filter(models.Teacher.user_id == current_user.id).first()
+    teacher = await db.scalar(select(models.Teacher).where(models.Teacher.user_id == current_user.id))
     if course.teacher_id != teacher.id:
         raise HTTPException(status_code=403, detail="Not authorized to view this course")
     
     # Get enrolled students
-    enrollments = db.query(models.Enrollment).filter(
+    enrollments = (await db.scalars(select(models.Enrollment).where(
         models.Enrollment.course_id == course_id
-    ).all()
+    ))).all()
     
     enrolled_student_ids = [enrollment.student_id for enrollment in enrollments]
     
@@ -380,35 +523,35 @@ async def remove_student_from_course(
     course_id: int,
     student_id: int,
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     if current_user.role != "teacher":
         raise HTTPException(status_code=403, detail="Not authorized")
     
     # Verify teacher owns the course
-    course = db.query(models.Course).filter(models.Course.id == course_id).first()
+    course = await db.scalar(select(models.Course).where(models.Course.id == course_id))
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
     
-    teacher = db.query(models.Teacher).filter(models.Teacher.user_id == current_user.id).first()
+    teacher = await db.scalar(select(models.Teacher).where(models.Teacher.user_id == current_user.id))
     if course.teacher_id != teacher.id:
         raise HTTPException(status_code=403, detail="Not authorized to modify this course")
     
     # Check if student exists
-    student = db.query(models.Student).filter(models.Student.id == student_id).first()
+    student = await db.scalar(select(models.Student).where(models.Student.id == student_id))
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
     
     # Find and delete enrollment
-    enrollment = db.query(models.Enrollment).filter(
+    enrollment = await db.scalar(select(models.Enrollment).where(
         models.Enrollment.course_id == course_id,
         models.Enrollment.student_id == student_id
-    ).first()
+    ))
     
     if not enrollment:
         raise HTTPException(status_code=404, detail="Student is not enrolled in this course")
     
-    db.delete(enrollment)
-    db.commit()
+    await db.delete(enrollment)
+    await db.commit()
     
     return {"message": "Student removed from course successfully"}
\ No newline at end of file
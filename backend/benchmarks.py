@@ -0,0 +1,719 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the EduHelp backend.
+
+    python benchmarks.py model   # sklearn vs flat forest: parity and per-call latency
+    python benchmarks.py explain # cost of per-feature contributions on top of predict_proba
+    python benchmarks.py memory  # per-worker RSS/PSS: private pickles vs shared mmap arrays
+    python benchmarks.py db      # concurrent chat reads/writes: default vs tuned SQLite (and PostgreSQL)
+    python benchmarks.py load    # HTTP load test: light-endpoint latency with and without heavy requests
+    python benchmarks.py queries # SQL statements per dashboard/listing request: constant and within budget
+    python benchmarks.py backplane # chat delivery across two workers: in-process vs pub/sub backplane
+    python benchmarks.py chatwrites # socket messages/sec: one transaction per message vs group commit
+"""
+
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+# Add the current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+
+def _per_call_us(fn, repeat):
+    fn()  # warm up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def _load_or_train(predictor):
+    """Load the current model, training and publishing one first if the registry is empty"""
+    predictor.load_model()
+    if predictor.model_version is None:
+        predictor.train_model()
+
+
+def bench_model(repeat=200):
+    """Compare sklearn predict+predict_proba with the flat NumPy forest"""
+    from app.ml_models import performance_predictor, FEATURES
+    from app.forest_engine import check_parity
+    from app.model_registry import registry
+
+    predictor = performance_predictor
+    _load_or_train(predictor)
+    # Serving skips the sklearn estimator when flat arrays exist; load it for comparison
+    model = registry.load(predictor.model_version)[1]["model.pkl"]
+
+    rng = np.random.RandomState(0)
+    X = rng.uniform([0.5, 50, 0, 60, 1], [1.0, 100, 10, 100, 20], size=(5000, len(FEATURES)))
+    X_scaled = predictor._scale(X)
+
+    parity = check_parity(model, predictor.forest, X_scaled)
+    print(f"🔍 Parity on {len(X)} rows (bit-identical predict_proba): {'OK' if parity else 'MISMATCH'}")
+
+    row = X_scaled[:1]
+    sklearn_us = _per_call_us(lambda: (model.predict(row), model.predict_proba(row)), repeat)
+    flat_us = _per_call_us(lambda: predictor.forest.predict_proba(row), repeat)
+    print(f"⏱️ Single row  - sklearn predict+predict_proba: {sklearn_us:9.1f} us")
+    print(f"⏱️ Single row  - flat forest predict_proba:     {flat_us:9.1f} us  ({sklearn_us / flat_us:.1f}x)")
+
+    batch = X_scaled[:600]
+    sklearn_us = _per_call_us(lambda: model.predict_proba(batch), repeat // 10)
+    flat_us = _per_call_us(lambda: predictor.forest.predict_proba(batch), repeat // 10)
+    print(f"⏱️ 600 rows    - sklearn predict_proba:         {sklearn_us:9.1f} us")
+    print(f"⏱️ 600 rows    - flat forest predict_proba:     {flat_us:9.1f} us  ({sklearn_us / flat_us:.1f}x)")
+
+    rows = [dict(zip(FEATURES, x)) for x in X[:1]]
+    end_to_end_us = _per_call_us(lambda: predictor.predict_many(rows), repeat)
+    print(f"⏱️ predict_student_risk end to end:             {end_to_end_us:9.1f} us")
+
+
+def bench_explain(repeat=200):
+    """Overhead of computing tree-path contributions in the same traversal"""
+    from app.ml_models import performance_predictor, FEATURES
+
+    predictor = performance_predictor
+    _load_or_train(predictor)
+    forest = predictor.forest
+
+    rng = np.random.RandomState(0)
+    X = rng.uniform([0.5, 50, 0, 60, 1], [1.0, 100, 10, 100, 20], size=(600, len(FEATURES)))
+    X_scaled = predictor._scale(X)
+
+    proba, bias, contributions = forest.predict_proba_explained(X_scaled)
+    error = np.abs(bias + contributions.sum(axis=1) - proba[:, 1]).max()
+    print(f"🔍 bias + sum(contributions) vs risk probability, max error: {error:.2e}")
+
+    for label, batch, n in (("Single row", X_scaled[:1], repeat), ("600 rows  ", X_scaled, repeat // 10)):
+        plain_us = _per_call_us(lambda: forest.predict_proba(batch), n)
+        explained_us = _per_call_us(lambda: forest.predict_proba_explained(batch), n)
+        print(f"⏱️ {label}  - predict_proba:           {plain_us:9.1f} us")
+        print(f"⏱️ {label}  - with contributions:      {explained_us:9.1f} us  "
+              f"(+{(explained_us / plain_us - 1) * 100:.0f}%)")
+
+
+def _memory_usage_kb():
+    """(RSS, PSS) of this process in kB; PSS splits shared pages between the processes mapping them"""
+    usage = {}
+    for path in ("/proc/self/smaps_rollup", "/proc/self/status"):
+        try:
+            with open(path) as f:
+                for line in f:
+                    key, _, value = line.partition(":")
+                    if key in ("Rss", "VmRSS", "Pss"):
+                        usage.setdefault(key.replace("VmRSS", "Rss"), int(value.split()[0]))
+        except OSError:
+            continue
+    return usage.get("Rss", 0), usage.get("Pss", 0)
+
+
+def _memory_worker(mode, version, ready, done, results):
+    """Load the model the given way, report memory, then hold it until told to exit"""
+    # Import everything a serving worker imports anyway, so the delta is model data only
+    import joblib
+    import sklearn.ensemble  # noqa: F401
+    from app.model_registry import registry
+    from app.forest_engine import FlatForest, compile_forest
+
+    baseline = _memory_usage_kb()
+    if mode == "pickle":
+        # Previous behaviour: every worker unpickles its own estimator and flat copy
+        model = joblib.load(os.path.join(registry.version_dir(version), "model.pkl"))
+        forest = compile_forest(model)
+    else:
+        _, artifacts = registry.load(version, exclude=("model.pkl",))
+        forest = FlatForest.from_artifacts(artifacts)
+        model = None
+    forest.predict_proba(np.zeros((256, 5)))  # touch every tree
+    loaded = _memory_usage_kb()
+    results.put((mode, baseline, loaded))
+    ready.release()
+    done.wait()
+
+
+def bench_memory(workers=4):
+    """Per-worker memory with private unpickled models vs memory-mapped shared arrays"""
+    from app.ml_models import performance_predictor
+    _load_or_train(performance_predictor)
+    version = performance_predictor.model_version
+
+    ctx = multiprocessing.get_context("spawn")
+    for mode in ("pickle", "mmap"):
+        ready, done, results = ctx.Semaphore(0), ctx.Event(), ctx.Queue()
+        procs = [ctx.Process(target=_memory_worker, args=(mode, version, ready, done, results))
+                 for _ in range(workers)]
+        for proc in procs:
+            proc.start()
+        # Sample only once every worker is holding the model at the same time
+        for _ in procs:
+            ready.acquire()
+        rows = [results.get() for _ in procs]
+        done.set()
+        for proc in procs:
+            proc.join()
+
+        def mean_mb(values):
+            return sum(values) / len(values) / 1024
+
+        print(f"📊 {mode:6} x{workers} workers - per worker RSS before {mean_mb([b[0] for _, b, _ in rows]):7.2f} MB, "
+              f"after {mean_mb([l[0] for _, _, l in rows]):7.2f} MB | model adds "
+              f"RSS {mean_mb([l[0] - b[0] for _, b, l in rows]):6.2f} MB, "
+              f"PSS {mean_mb([l[1] - b[1] for _, b, l in rows]):6.2f} MB")
+    print("ℹ️ PSS counts shared page-cache pages once across workers; "
+          "the mmap row should drop as worker count grows")
+
+
+def _db_mode(url, sqlite_tuned, writers, readers, seconds):
+    """Run writer and reader threads against one engine; returns (writes/s, reads/s, errors)"""
+    from sqlalchemy import func, select
+    from sqlalchemy.orm import sessionmaker
+    from app import models
+    from app.database import build_engine
+
+    engine = build_engine(url, pool_size=writers + readers, sqlite_tuned=sqlite_tuned)
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+
+    with Session() as db:
+        users = [models.User(email=f"bench{i}@example.com", username=f"bench{i}", role="student",
+                             hashed_password="x", full_name=f"Bench {i}") for i in range(2)]
+        db.add_all(users)
+        db.flush()
+        conversation = models.ChatConversation(user1_id=users[0].id, user2_id=users[1].id)
+        db.add(conversation)
+        db.commit()
+        sender_id, receiver_id, conversation_id = users[0].id, users[1].id, conversation.id
+
+    counts = {"writes": 0, "reads": 0, "errors": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def count(key):
+        with lock:
+            counts[key] += 1
+
+    def writer():
+        while time.perf_counter() < deadline:
+            try:
+                with Session() as db:
+                    db.add(models.ChatMessage(conversation_id=conversation_id, sender_id=sender_id,
+                                              receiver_id=receiver_id, message="benchmark message"))
+                    db.commit()
+                count("writes")
+            except Exception:
+                count("errors")
+
+    def reader():
+        while time.perf_counter() < deadline:
+            try:
+                with Session() as db:
+                    db.execute(
+                        select(models.ChatMessage)
+                        .where(models.ChatMessage.conversation_id == conversation_id)
+                        .order_by(models.ChatMessage.id.desc()).limit(50)
+                    ).all()
+                    db.execute(select(func.count(models.ChatMessage.id)).where(
+                        models.ChatMessage.receiver_id == receiver_id,
+                        models.ChatMessage.is_read == False  # noqa: E712
+                    )).scalar()
+                count("reads")
+            except Exception:
+                count("errors")
+
+    threads = [threading.Thread(target=writer) for _ in range(writers)]
+    threads += [threading.Thread(target=reader) for _ in range(readers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    models.Base.metadata.drop_all(bind=engine)
+    engine.dispose()
+    return counts["writes"] / elapsed, counts["reads"] / elapsed, counts["errors"]
+
+
+def bench_db(writers=4, readers=8, seconds=5.0):
+    """Concurrent chat-style throughput for each database mode
+
+    Set BENCH_POSTGRES_URL to include a PostgreSQL database (its tables are dropped).
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        modes = [
+            ("sqlite default", f"sqlite:///{os.path.join(tmp, 'default.db')}", False),
+            ("sqlite tuned  ", f"sqlite:///{os.path.join(tmp, 'tuned.db')}", True),
+        ]
+        if os.environ.get("BENCH_POSTGRES_URL"):
+            modes.append(("postgresql    ", os.environ["BENCH_POSTGRES_URL"], False))
+
+        print(f"🧵 {writers} writer and {readers} reader threads, {seconds:.0f}s per mode")
+        for label, url, tuned in modes:
+            writes, reads, errors = _db_mode(url, tuned, writers, readers, seconds)
+            print(f"⏱️ {label} - writes {writes:8.1f}/s, reads {reads:8.1f}/s, errors {errors}")
+
+
+def _select_ids(model, *criteria):
+    from sqlalchemy import select
+    return select(model.id).where(*criteria).order_by(model.id)
+
+
+def _seed_load_test(url, students, attendance_days, inbox_messages):
+    """One teacher and course with ``students`` enrollments, their attendance history and
+    ``inbox_messages`` unread chat messages to the teacher; returns the course id"""
+    from datetime import date, timedelta
+    from sqlalchemy import insert
+    from sqlalchemy.orm import sessionmaker
+    from app import models
+    from app.auth import get_password_hash
+    from app.counters import reconcile_counters
+    from app.database import build_engine
+
+    engine = build_engine(url)
+    models.Base.metadata.create_all(bind=engine)
+    password = get_password_hash("password")
+    with sessionmaker(bind=engine)() as db:
+        teacher_user = models.User(username="teacher1", email="teacher@example.com", role="teacher",
+                                   hashed_password=password, full_name="Load Teacher")
+        db.add(teacher_user)
+        db.flush()
+        teacher = models.Teacher(user_id=teacher_user.id, department="CS", qualifications="PhD")
+        db.add(teacher)
+        db.flush()
+        course = models.Course(title="Load course", description="", teacher_id=teacher.id)
+        db.add(course)
+        db.flush()
+
+        db.execute(insert(models.User), [
+            {"username": f"student{i}", "email": f"student{i}@example.com", "role": "student",
+             "hashed_password": password, "full_name": f"Student {i}"}
+            for i in range(students)
+        ])
+        user_ids = db.execute(_select_ids(models.User, models.User.role == "student")).scalars().all()
+        db.execute(insert(models.Student), [{"user_id": user_id, "grade_level": "UG", "department": "CS"}
+                                            for user_id in user_ids])
+        student_ids = db.execute(_select_ids(models.Student)).scalars().all()
+        db.execute(insert(models.Enrollment), [{"student_id": student_id, "course_id": course.id}
+                                               for student_id in student_ids])
+        enrollment_ids = db.execute(_select_ids(models.Enrollment)).scalars().all()
+        today = date.today()
+        db.execute(insert(models.Attendance), [
+            {"enrollment_id": enrollment_id, "date": today - timedelta(days=day),
+             "status": "present" if (enrollment_id + day) % 5 else "absent"}
+            for enrollment_id in enrollment_ids for day in range(attendance_days)
+        ])
+
+        conversation = models.ChatConversation(user1_id=teacher_user.id, user2_id=user_ids[0])
+        db.add(conversation)
+        db.flush()
+        db.execute(insert(models.ChatMessage), [
+            {"conversation_id": conversation.id, "sender_id": user_ids[i % len(user_ids)],
+             "receiver_id": teacher_user.id, "message": "question", "is_read": False}
+            for i in range(inbox_messages)
+        ])
+        # Bulk inserts bypass the counter hooks
+        reconcile_counters(db)
+        db.commit()
+        course_id = course.id
+    engine.dispose()
+    return course_id
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_server(tmp, **env):
+    """A uvicorn worker (one process) on a free port, running in ``tmp``; returns (process, base url)
+    once /health answers"""
+    import httpx
+
+    port = _free_port()
+    env = dict(os.environ, MODEL_REGISTRY_DIR=os.path.join(tmp, "models"),
+               PYTHONPATH=os.path.dirname(os.path.abspath(__file__)), **env)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=tmp, env=env
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(600):
+        try:
+            if httpx.get(f"{base_url}/health").status_code == 200:
+                break
+        except httpx.TransportError:
+            pass
+        time.sleep(0.1)
+    return server, base_url
+
+
+def _login(base_url, username, password="password"):
+    import httpx
+
+    response = httpx.post(f"{base_url}/auth/token", data={"username": username, "password": password})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+def _percentiles(samples):
+    if not samples:
+        return "no samples"
+    ms = np.array(samples) * 1000
+    return (f"n={len(ms):5d} p50 {np.percentile(ms, 50):7.1f} ms, p95 {np.percentile(ms, 95):7.1f} ms, "
+            f"p99 {np.percentile(ms, 99):7.1f} ms")
+
+
+async def _load_phase(base_url, light, heavy, seconds, light_clients, heavy_clients):
+    """Closed-loop clients for ``seconds``; light/heavy are (path, token); returns both latency lists"""
+    import httpx
+
+    latencies = {"light": [], "heavy": []}
+    deadline = time.perf_counter() + seconds
+
+    async def client_loop(client, kind, path, token):
+        headers = {"Authorization": f"Bearer {token}"}
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = await client.get(path, headers=headers)
+            response.raise_for_status()
+            latencies[kind].append(time.perf_counter() - started)
+
+    limits = httpx.Limits(max_connections=light_clients + heavy_clients)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        await asyncio.gather(*[client_loop(client, "light", *light) for _ in range(light_clients)],
+                             *[client_loop(client, "heavy", *heavy) for _ in range(heavy_clients)])
+    return latencies["light"], latencies["heavy"]
+
+
+def bench_load(students=2000, attendance_days=20, inbox_messages=300_000, seconds=10.0,
+               light_clients=8, heavy_clients=2):
+    """Light-endpoint latency alone and while heavy requests run (uvicorn, one worker)
+
+    Two kinds of extra load: clients polling the unread count of a 300k-message
+    inbox (a maintained counter read; it used to COUNT the inbox in SQLite) and a
+    CPU-bound one (scoring a 2000-student course live, which competes for the
+    interpreter).
+    """
+    import httpx
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'load.db')}"
+        course_id = _seed_load_test(url, students, attendance_days, inbox_messages)
+        print(f"🌱 Seeded {students} enrollments x {attendance_days} attendance rows, "
+              f"{inbox_messages} inbox messages")
+
+        server, base_url = _start_server(tmp, DATABASE_URL=url)
+        try:
+            student_token, teacher_token = _login(base_url, "student0"), _login(base_url, "teacher1")
+            # First analytics call waits for the model warm-up; keep it out of the numbers
+            httpx.get(f"{base_url}/api/teacher/analytics/{course_id}", timeout=300,
+                      headers={"Authorization": f"Bearer {teacher_token}"}).raise_for_status()
+
+            light = ("/auth/me", student_token)
+            scenarios = [
+                ("light only  ", None),
+                ("+ unread poll", ("/api/chat/unread-count", teacher_token)),
+                ("+ cpu-bound ", (f"/api/teacher/analytics/{course_id}?fresh=true", teacher_token)),
+            ]
+            for label, heavy in scenarios:
+                light_latency, heavy_latency = asyncio.run(_load_phase(
+                    base_url, light, heavy, seconds, light_clients, heavy_clients if heavy else 0
+                ))
+                print(f"⏱️ {label} - light GET {light[0]}: {_percentiles(light_latency)}")
+                if heavy:
+                    print(f"   {' ' * len(label)}   heavy GET {heavy[0]}: {_percentiles(heavy_latency)}")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def _seed_query_test(url, courses):
+    """A teacher with ``courses`` courses (each with resources, assignments, ``courses`` students
+    and stored risk scores) and one student enrolled in all of them; returns the first course id"""
+    from sqlalchemy import insert
+    from sqlalchemy.orm import sessionmaker
+    from app import models
+    from app.database import build_engine
+
+    engine = build_engine(url)
+    models.Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine)() as db:
+        db.execute(insert(models.User), [
+            {"username": f"user{i}", "email": f"user{i}@example.com", "full_name": f"User {i}",
+             "role": "teacher" if i == 0 else "student", "hashed_password": "x"}
+            for i in range(courses + 1)
+        ])
+        user_ids = db.execute(_select_ids(models.User)).scalars().all()
+        db.add(models.Teacher(user_id=user_ids[0], department="CS", qualifications="PhD"))
+        db.execute(insert(models.Student), [{"user_id": user_id, "grade_level": "UG", "department": "CS"}
+                                            for user_id in user_ids[1:]])
+        db.flush()
+        teacher_id = db.execute(_select_ids(models.Teacher)).scalars().first()
+        student_ids = db.execute(_select_ids(models.Student)).scalars().all()
+        db.execute(insert(models.Course), [{"title": f"Course {i}", "description": "", "teacher_id": teacher_id}
+                                           for i in range(courses)])
+        course_ids = db.execute(_select_ids(models.Course)).scalars().all()
+        db.execute(insert(models.Resource), [
+            {"title": f"Resource {i}", "resource_type": "pdf", "file_path": "", "course_id": course_id}
+            for course_id in course_ids for i in range(3)
+        ])
+        db.execute(insert(models.Assignment), [
+            {"title": f"Assignment {i}", "max_points": 100, "course_id": course_id}
+            for course_id in course_ids for i in range(7)
+        ])
+        # Student 0 takes every course; course 0 has every student
+        pairs = {(student_ids[0], course_id) for course_id in course_ids}
+        pairs |= {(student_id, course_ids[0]) for student_id in student_ids}
+        db.execute(insert(models.Enrollment), [{"student_id": student_id, "course_id": course_id}
+                                               for student_id, course_id in sorted(pairs)])
+        db.execute(insert(models.RiskScore), [
+            {"enrollment_id": enrollment_id, "course_id": course_id, "attendance_rate": 0.9,
+             "assignment_avg": 80.0, "at_risk": False, "risk_probability": 0.1, "risk_level": "Low",
+             "recommendations": "[]", "model_version": "seed"}
+            for enrollment_id, course_id in db.execute(
+                _select_ids(models.Enrollment).add_columns(models.Enrollment.course_id)
+            ).all()
+        ])
+        db.commit()
+    engine.dispose()
+    return course_ids[0]
+
+
+async def _count_request_queries(url, course_id):
+    """{endpoint: (SQL statements issued, declared query budget)} for the student and teacher
+    read endpoints, counting the authentication lookup like a real request does"""
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+    from app import student, teacher
+    from app.auth import get_user
+    from app.database import build_async_engine, to_async_url
+    from app.queries import count_queries
+
+    engine = build_async_engine(to_async_url(url))
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    # user0 is the teacher, user1 the student enrolled in every course
+    endpoints = {
+        "GET /api/student/dashboard": (student.get_student_dashboard, "user1", {}),
+        "GET /api/student/courses": (student.get_student_courses, "user1", {}),
+        "GET /api/teacher/dashboard": (teacher.get_teacher_dashboard, "user0", {}),
+        "GET /api/teacher/analytics/{id}": (teacher.get_course_analytics, "user0",
+                                            {"course_id": course_id, "fresh": False}),
+    }
+    counts = {}
+    for name, (handler, username, kwargs) in endpoints.items():
+        async with session_factory() as db:
+            with count_queries(engine) as statements:
+                user = await get_user(db, username=username)
+                await handler(current_user=user, db=db, **kwargs)
+        counts[name] = (len(statements), getattr(handler, "query_budget", None))
+    await engine.dispose()
+    return counts
+
+
+def bench_queries(small=1, large=8):
+    """SQL statements per request for a student in ``small`` vs ``large`` courses
+    (and a course with that many students); eager loading keeps them equal and
+    within each endpoint's @query_budget"""
+    counts = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in (small, large):
+            url = f"sqlite:///{os.path.join(tmp, f'queries{size}.db')}"
+            course_id = _seed_query_test(url, size)
+            counts[size] = asyncio.run(_count_request_queries(url, course_id))
+
+    growing, over_budget = [], []
+    for name, (few, budget) in counts[small].items():
+        many = counts[large][name][0]
+        within = budget is None or max(few, many) <= budget
+        ok = few == many and within
+        print(f"{'✅' if ok else '❌'} {name:32s} {few:3d} queries at {small} enrollment(s), "
+              f"{many:3d} at {large} (budget {budget if budget is not None else '-'})")
+        if few != many:
+            growing.append(name)
+        if not within:
+            over_budget.append(name)
+    if growing:
+        print(f"❌ Query count grows with enrollments: {', '.join(growing)}")
+    if over_budget:
+        print(f"❌ Over the declared query budget: {', '.join(over_budget)}")
+    if growing or over_budget:
+        sys.exit(1)
+
+
+def _seed_chat_users(url, usernames):
+    """Users (password "password") for the chat benchmarks; returns {username: user id}"""
+    from sqlalchemy import select
+    from sqlalchemy.orm import sessionmaker
+    from app import models
+    from app.auth import get_password_hash
+    from app.database import build_engine
+
+    engine = build_engine(url)
+    models.Base.metadata.create_all(bind=engine)
+    password = get_password_hash("password")
+    with sessionmaker(bind=engine)() as db:
+        db.add_all([models.User(username=name, email=f"{name}@example.com", role="student",
+                                hashed_password=password, full_name=name.title()) for name in usernames])
+        db.commit()
+        ids = dict(db.execute(select(models.User.username, models.User.id)).all())
+    engine.dispose()
+    return ids
+
+
+async def _cross_worker_delivery(listener_url, sender_url, tokens, receiver_id, messages, timeout=5.0):
+    """alice listens on one worker while bob sends to her from another, over his socket and
+    through POST /api/chat/send; returns the delivery latencies of what arrived"""
+    import httpx
+    import websockets
+
+    sent_at, latencies = {}, []
+
+    async def receive(socket):
+        while len(latencies) < 2 * messages:
+            event = json.loads(await socket.recv())
+            # Socket messages carry the text directly, /send events nest the stored message
+            text = event["message"]["message"] if event["type"] == "new_message" else event["message"]
+            latencies.append(time.perf_counter() - sent_at[text])
+
+    ws_url = lambda base_url, token: f"{base_url.replace('http', 'ws', 1)}/api/chat/ws/{token}"
+    async with websockets.connect(ws_url(listener_url, tokens["alice"])) as alice, \
+            websockets.connect(ws_url(sender_url, tokens["bob"])) as bob, \
+            httpx.AsyncClient(base_url=sender_url, headers={"Authorization": f"Bearer {tokens['bob']}"}) as client:
+        receiver = asyncio.create_task(receive(alice))
+        for i in range(messages):
+            sent_at[f"socket {i}"] = time.perf_counter()
+            await bob.send(json.dumps({"type": "message", "receiver_id": receiver_id, "message": f"socket {i}"}))
+            await bob.recv()  # "sent" acknowledgement
+        for i in range(messages):
+            sent_at[f"http {i}"] = time.perf_counter()
+            (await client.post("/api/chat/send", params={"receiver_id": receiver_id, "message": f"http {i}"})
+             ).raise_for_status()
+        try:
+            await asyncio.wait_for(receiver, timeout)
+        except asyncio.TimeoutError:
+            pass
+    return latencies
+
+
+def bench_backplane(messages=200):
+    """Chat delivery between two uvicorn workers: in-process only vs through the pub/sub backplane
+    (pubsub_broker.py over a UNIX socket); fails unless every message crosses workers"""
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'chat.db')}"
+        users = _seed_chat_users(url, ["alice", "bob"])
+        socket_path = os.path.join(tmp, "broker.sock")
+        broker = subprocess.Popen([sys.executable, os.path.abspath(__file__).replace("benchmarks.py", "pubsub_broker.py"),
+                                   "--unix", socket_path], stdout=subprocess.DEVNULL)
+        try:
+            for label, backplane_url in (("in-process", ""), ("backplane ", f"unix://{socket_path}")):
+                servers = [_start_server(tmp, DATABASE_URL=url, CHAT_BACKPLANE_URL=backplane_url) for _ in range(2)]
+                try:
+                    (_, listener_url), (_, sender_url) = servers
+                    tokens = {name: _login(sender_url, name) for name in users}
+                    latencies = asyncio.run(_cross_worker_delivery(
+                        listener_url, sender_url, tokens, users["alice"], messages,
+                        timeout=5.0 if backplane_url else 1.0
+                    ))
+                finally:
+                    for server, _ in servers:
+                        server.terminate()
+                        server.wait()
+                delivered = len(latencies)
+                icon = "✅" if delivered == 2 * messages else "❌" if backplane_url else "⚠️"
+                print(f"{icon} {label} - {delivered}/{2 * messages} "
+                      f"messages reached the other worker: {_percentiles(latencies)}")
+                failed |= bool(backplane_url) and delivered != 2 * messages
+        finally:
+            broker.terminate()
+            broker.wait()
+    if failed:
+        sys.exit(1)
+
+
+async def _socket_write_phase(base_url, tokens, receivers, seconds):
+    """Each sender sends over its socket and waits for the "sent" acknowledgement (which comes
+    after the message is stored) before sending again; returns the ack latencies"""
+    import websockets
+
+    latencies = []
+    deadline = time.perf_counter() + seconds
+
+    async def sender(token, receiver_id):
+        async with websockets.connect(f"{base_url.replace('http', 'ws', 1)}/api/chat/ws/{token}") as socket:
+            i = 0
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                await socket.send(json.dumps({"type": "message", "receiver_id": receiver_id, "message": f"m{i}"}))
+                event = json.loads(await socket.recv())
+                if event["type"] == "sent":
+                    latencies.append(time.perf_counter() - start)
+                i += 1
+
+    await asyncio.gather(*(sender(token, receiver_id) for token, receiver_id in zip(tokens, receivers)))
+    return latencies
+
+
+def bench_chat_writes(senders=50, seconds=5.0):
+    """Stored socket messages per second on one uvicorn worker (SQLite in WAL mode): a transaction
+    per message (CHAT_GROUP_COMMIT=0) vs the batched group-commit writer"""
+    from app.auth import create_access_token
+
+    rates = {}
+    for label, group_commit in (("per message ", "0"), ("group commit", "1")):
+        with tempfile.TemporaryDirectory() as tmp:
+            url = f"sqlite:///{os.path.join(tmp, 'chat.db')}"
+            users = _seed_chat_users(url, [f"sender{i}" for i in range(senders)] +
+                                     [f"receiver{i}" for i in range(senders)])
+            tokens = [create_access_token({"sub": f"sender{i}"}) for i in range(senders)]
+            receivers = [users[f"receiver{i}"] for i in range(senders)]
+            server, base_url = _start_server(tmp, DATABASE_URL=url, CHAT_GROUP_COMMIT=group_commit)
+            try:
+                latencies = asyncio.run(_socket_write_phase(base_url, tokens, receivers, seconds))
+            finally:
+                server.terminate()
+                server.wait()
+        rates[label] = len(latencies) / seconds
+        print(f"⏱️  {label} - {rates[label]:8.0f} messages/s, ack {_percentiles(latencies)}")
+    print(f"📊 group commit: {rates['group commit'] / max(rates['per message '], 1e-9):.1f}x the messages/s "
+          f"with {senders} concurrent senders")
+
+
+BENCHMARKS = {
+    "model": bench_model,
+    "explain": bench_explain,
+    "memory": bench_memory,
+    "db": bench_db,
+    "load": bench_load,
+    "queries": bench_queries,
+    "backplane": bench_backplane,
+    "chatwrites": bench_chat_writes,
+}
+
+
+def main():
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"❌ Unknown benchmark '{name}'. Available: {', '.join(BENCHMARKS)}")
+            sys.exit(1)
+        print("=" * 60)
+        print(f"Benchmark: {name}")
+        print("=" * 60)
+        BENCHMARKS[name]()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,10 @@
 from app.database import SessionLocal, engine
-from app.models import Base, User, Student, Teacher, Course, Enrollment, Alumni
+from app.models import User, Student, Teacher, Course, Enrollment, Alumni
 from app.auth import get_password_hash
+from app.schema import upgrade_database
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+# Create or upgrade the schema
+upgrade_database(engine)
 
 
 def get_or_create_user(db, username, email, full_name, role, password="password"):
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Database schema migrations (Alembic). The database comes from DATABASE_URL.
+
+    python migrate.py                          # upgrade to the latest revision
+    python migrate.py --check-indexes          # EXPLAIN the hot queries, fail on full scans
+    python migrate.py --current                # show the database's revision
+    python migrate.py --downgrade 0001         # step back to a revision
+    python migrate.py --revision -m "add x"    # autogenerate a revision from app/models.py
+
+Existing databases created before migrations were introduced are adopted
+automatically on the first upgrade.
+"""
+
+import argparse
+import os
+import sys
+
+# Add the current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from alembic import command
+
+from app.database import engine
+from app.schema import alembic_config, upgrade_database, current_revision, check_hot_path_indexes
+
+
+def check_indexes():
+    results = check_hot_path_indexes(engine)
+    for name, uses_index, plan in results:
+        print(f"{'✅' if uses_index else '❌'} {name}")
+        if not uses_index:
+            for line in plan:
+                print(f"      {line}")
+    failed = [name for name, uses_index, _ in results if not uses_index]
+    if failed:
+        print(f"\n❌ {len(failed)} hot queries are not served by an index")
+        return False
+    print(f"\n✅ All {len(results)} hot queries use an index")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply and manage database schema migrations")
+    parser.add_argument("--upgrade", metavar="REVISION", default="head", help="target revision (default: head)")
+    parser.add_argument("--downgrade", metavar="REVISION", help="downgrade to this revision")
+    parser.add_argument("--current", action="store_true", help="print the current revision")
+    parser.add_argument("--check-indexes", action="store_true",
+                        help="upgrade, then check that the hot queries use indexes")
+    parser.add_argument("--revision", action="store_true", help="autogenerate a new revision")
+    parser.add_argument("-m", "--message", help="message for --revision")
+    args = parser.parse_args()
+
+    if args.current:
+        print(f"📌 Current revision: {current_revision(engine) or 'none'}")
+        return
+
+    if args.revision:
+        if not args.message:
+            parser.error("--revision needs -m/--message")
+        with engine.connect() as connection:
+            command.revision(alembic_config(connection), message=args.message, autogenerate=True)
+        return
+
+    if args.downgrade:
+        with engine.connect() as connection:
+            command.downgrade(alembic_config(connection), args.downgrade)
+        print(f"✅ Downgraded to {current_revision(engine) or 'an empty schema'}")
+        return
+
+    upgrade_database(engine, args.upgrade)
+    print(f"✅ Database at revision {current_revision(engine)}")
+
+    if args.check_indexes and not check_indexes():
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+from logging.config import fileConfig
+
+from alembic import context
+
+from app import models
+from app.database import SQLALCHEMY_DATABASE_URL, build_engine
+
+config = context.config
+
+# An engine/connection handed over by app.schema.upgrade_database() is reused;
+# the alembic CLI builds one from DATABASE_URL
+connection = config.attributes.get("connection")
+
+if connection is None and config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = models.Base.metadata
+
+
+def _configure(**kwargs):
+    context.configure(
+        target_metadata=target_metadata,
+        # SQLite can't ALTER most things in place; batch mode recreates the table instead
+        render_as_batch=True,
+        compare_type=True,
+        **kwargs
+    )
+
+
+def run_migrations_offline():
+    _configure(url=SQLALCHEMY_DATABASE_URL, literal_binds=True, dialect_opts={"paramstyle": "named"})
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    if connection is not None:
+        _configure(connection=connection)
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+
+    engine = build_engine(SQLALCHEMY_DATABASE_URL)
+    try:
+        with engine.connect() as new_connection:
+            _configure(connection=new_connection)
+            with context.begin_transaction():
+                context.run_migrations()
+    finally:
+        engine.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,76 @@
+"""hot path indexes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-16 22:53:25.494104
+
+Indexes for the lookups every request makes (profiles by user, enrollments by
+student/course, chat by conversation/receiver, attendance by enrollment, ...).
+
+On PostgreSQL they are built with CREATE INDEX CONCURRENTLY outside the
+migration transaction, so reads and writes continue while they build. SQLite
+builds them in place. Unique indexes fail with a readable error if existing
+rows already contain duplicates, which then have to be cleaned up first.
+"""
+from contextlib import nullcontext
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+# (index name, table, columns, unique)
+INDEXES = [
+    ('ix_students_user_id', 'students', ['user_id'], True),
+    ('ix_teachers_user_id', 'teachers', ['user_id'], True),
+    ('ix_alumni_user_id', 'alumni', ['user_id'], True),
+    ('ux_enrollments_student_course', 'enrollments', ['student_id', 'course_id'], True),
+    ('ix_courses_teacher_id', 'courses', ['teacher_id'], False),
+    ('ix_enrollments_course_id', 'enrollments', ['course_id'], False),
+    ('ix_attendance_enrollment_id', 'attendance', ['enrollment_id'], False),
+    ('ix_resources_course_id', 'resources', ['course_id'], False),
+    ('ix_assignments_course_due', 'assignments', ['course_id', 'due_date'], False),
+    ('ix_assignment_submissions_student_assignment', 'assignment_submissions',
+     ['student_id', 'assignment_id'], False),
+    ('ix_chat_conversations_users', 'chat_conversations', ['user1_id', 'user2_id'], False),
+    ('ix_chat_conversations_user2_id', 'chat_conversations', ['user2_id'], False),
+    ('ix_chat_messages_conversation_created', 'chat_messages', ['conversation_id', 'created_at'], False),
+    ('ix_chat_messages_receiver_unread', 'chat_messages', ['receiver_id', 'is_read'], False),
+]
+
+
+def _check_unique(table, columns):
+    key = ", ".join(columns)
+    duplicates = op.get_bind().execute(sa.text(
+        f"SELECT {key}, COUNT(*) FROM {table} WHERE {' AND '.join(f'{c} IS NOT NULL' for c in columns)} "
+        f"GROUP BY {key} HAVING COUNT(*) > 1 LIMIT 5"
+    )).all()
+    if duplicates:
+        raise RuntimeError(
+            f"Cannot create unique index on {table}({key}): duplicate rows exist, e.g. "
+            f"{[tuple(row) for row in duplicates]}. Remove the duplicates and re-run the migration."
+        )
+
+
+def upgrade():
+    concurrently = op.get_bind().dialect.name == "postgresql"
+    for name, table, columns, unique in INDEXES:
+        if unique:
+            _check_unique(table, columns)
+    # CONCURRENTLY can't run inside a transaction block
+    with op.get_context().autocommit_block() if concurrently else nullcontext():
+        for name, table, columns, unique in INDEXES:
+            op.create_index(name, table, columns, unique=unique, if_not_exists=True,
+                            postgresql_concurrently=concurrently)
+
+
+def downgrade():
+    concurrently = op.get_bind().dialect.name == "postgresql"
+    with op.get_context().autocommit_block() if concurrently else nullcontext():
+        for name, table, columns, unique in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=concurrently)
+
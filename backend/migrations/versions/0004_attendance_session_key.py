@@ -0,0 +1,71 @@
+"""attendance session key
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 00:12:41.508316
+
+Attendance is recorded per session day, upserted on (enrollment_id, date):
+
+- ``date`` becomes a DATE (existing timestamps keep their day);
+- rows that collapse onto the same enrollment and day keep the latest one;
+- the unique (enrollment_id, date) index replaces the enrollment_id index
+  (it serves the same lookups) and the redundant index on the primary key.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+_KEYED = "enrollment_id IS NOT NULL AND date IS NOT NULL"
+DEDUPLICATE = (
+    f"DELETE FROM attendance WHERE {_KEYED} AND id NOT IN ("
+    f"SELECT MAX(id) FROM attendance WHERE {_KEYED} GROUP BY enrollment_id, date)"
+)
+
+
+def _attendance(date_type, *indexes):
+    # SQLite batch copies CAST changed columns, and CAST(... AS DATE) yields a
+    # number there; rebuilding from an explicit definition copies the values as is
+    return sa.Table(
+        'attendance', sa.MetaData(),
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('enrollment_id', sa.Integer(), nullable=True),
+        sa.Column('date', date_type, nullable=True),
+        sa.Column('status', sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(['enrollment_id'], ['enrollments.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        *indexes
+    )
+
+
+def upgrade():
+    if op.get_bind().dialect.name == "sqlite":
+        # Drop the time part so equal days compare equal
+        op.execute("UPDATE attendance SET date = DATE(date) WHERE date IS NOT NULL")
+        with op.batch_alter_table('attendance', copy_from=_attendance(sa.Date()), recreate='always'):
+            pass
+    else:
+        op.alter_column('attendance', 'date', existing_type=sa.DateTime(), type_=sa.Date(),
+                        existing_nullable=True, postgresql_using='date::date')
+        op.drop_index('ix_attendance_enrollment_id', table_name='attendance')
+        op.drop_index('ix_attendance_id', table_name='attendance')
+
+    op.execute(DEDUPLICATE)
+    op.create_index('ux_attendance_enrollment_date', 'attendance', ['enrollment_id', 'date'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ux_attendance_enrollment_date', table_name='attendance')
+    if op.get_bind().dialect.name == "sqlite":
+        op.execute("UPDATE attendance SET date = date || ' 00:00:00.000000' WHERE date IS NOT NULL")
+        with op.batch_alter_table('attendance', copy_from=_attendance(sa.DateTime()), recreate='always'):
+            pass
+    else:
+        op.alter_column('attendance', 'date', existing_type=sa.Date(), type_=sa.DateTime(),
+                        existing_nullable=True)
+    op.create_index('ix_attendance_id', 'attendance', ['id'], unique=False)
+    op.create_index('ix_attendance_enrollment_id', 'attendance', ['enrollment_id'], unique=False)
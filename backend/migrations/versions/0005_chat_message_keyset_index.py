@@ -0,0 +1,43 @@
+"""chat message keyset index
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 00:58:03.117592
+
+Chat history is paged by message id within a conversation, so the
+(conversation_id, created_at) index is replaced by (conversation_id, id).
+Built CONCURRENTLY on PostgreSQL, like 0002.
+"""
+from contextlib import nullcontext
+
+from alembic import op
+
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def _index_ops():
+    concurrently = op.get_bind().dialect.name == "postgresql"
+    # CONCURRENTLY can't run inside a transaction block
+    return concurrently, op.get_context().autocommit_block() if concurrently else nullcontext()
+
+
+def upgrade():
+    concurrently, block = _index_ops()
+    with block:
+        op.create_index('ix_chat_messages_conversation_id', 'chat_messages', ['conversation_id', 'id'],
+                        unique=False, if_not_exists=True, postgresql_concurrently=concurrently)
+        op.drop_index('ix_chat_messages_conversation_created', table_name='chat_messages', if_exists=True,
+                      postgresql_concurrently=concurrently)
+
+
+def downgrade():
+    concurrently, block = _index_ops()
+    with block:
+        op.create_index('ix_chat_messages_conversation_created', 'chat_messages', ['conversation_id', 'created_at'],
+                        unique=False, if_not_exists=True, postgresql_concurrently=concurrently)
+        op.drop_index('ix_chat_messages_conversation_id', table_name='chat_messages', if_exists=True,
+                      postgresql_concurrently=concurrently)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Minimal Redis-protocol pub/sub broker for running several API workers locally
+without a Redis server. It speaks just enough RESP for the chat backplane
+(SUBSCRIBE, UNSUBSCRIBE, PUBLISH, PING, AUTH); use real Redis in production.
+
+    python pubsub_broker.py --unix /tmp/eduhub-chat.sock
+    CHAT_BACKPLANE_URL=unix:///tmp/eduhub-chat.sock uvicorn app.main:app --workers 4
+
+    python pubsub_broker.py --port 6380
+    CHAT_BACKPLANE_URL=redis://127.0.0.1:6380 uvicorn app.main:app --workers 4
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+# Add the current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.backplane import BackplaneError, encode, read_reply
+
+
+class Broker:
+    def __init__(self):
+        self.channels = {}  # channel -> set of subscriber writers
+
+    async def handle(self, reader, writer):
+        subscribed = set()
+        try:
+            while True:
+                try:
+                    command = await read_reply(reader)
+                except (ConnectionError, asyncio.IncompleteReadError, BackplaneError):
+                    break
+                if not isinstance(command, list) or not command:
+                    writer.write(b"-ERR expected a command array\r\n")
+                    continue
+                name, args = command[0].decode().upper(), [arg.decode() for arg in command[1:]]
+                if name == "SUBSCRIBE":
+                    for channel in args:
+                        self.channels.setdefault(channel, set()).add(writer)
+                        subscribed.add(channel)
+                        writer.write(encode("subscribe", channel, len(subscribed)))
+                elif name == "UNSUBSCRIBE":
+                    for channel in args or list(subscribed):
+                        self._remove(channel, writer)
+                        subscribed.discard(channel)
+                        writer.write(encode("unsubscribe", channel, len(subscribed)))
+                elif name == "PUBLISH" and len(args) == 2:
+                    receivers = self.channels.get(args[0], ())
+                    message = encode("message", args[0], command[2])
+                    for subscriber in receivers:
+                        subscriber.write(message)
+                    writer.write(b":%d\r\n" % len(receivers))
+                elif name == "PING":
+                    writer.write(b"+PONG\r\n")
+                elif name == "AUTH":
+                    writer.write(b"+OK\r\n")
+                else:
+                    writer.write(f"-ERR unsupported command '{name}'\r\n".encode())
+                await writer.drain()
+        finally:
+            for channel in subscribed:
+                self._remove(channel, writer)
+            writer.close()
+
+    def _remove(self, channel, writer):
+        subscribers = self.channels.get(channel)
+        if subscribers is not None:
+            subscribers.discard(writer)
+            if not subscribers:
+                del self.channels[channel]
+
+
+async def serve(args):
+    broker = Broker()
+    if args.unix:
+        if os.path.exists(args.unix):
+            os.remove(args.unix)
+        server = await asyncio.start_unix_server(broker.handle, path=args.unix)
+        where = f"unix://{args.unix}"
+    else:
+        server = await asyncio.start_server(broker.handle, args.host, args.port)
+        where = f"redis://{args.host}:{args.port}"
+    print(f"📡 Pub/sub broker listening on {where}", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Redis-protocol pub/sub broker for the chat backplane")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6380)
+    parser.add_argument("--unix", metavar="PATH", help="listen on a UNIX socket instead of TCP")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
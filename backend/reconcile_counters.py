@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Recount the denormalized counters (course student/assignment/resource counts,
+unread messages per user and per conversation) from the source rows and
+repair any that drifted, e.g. after bulk inserts or manual SQL.
+
+    python reconcile_counters.py              # repair drifted counters once
+    python reconcile_counters.py --dry-run    # only report drift
+    python reconcile_counters.py --every 3600 # keep reconciling every hour
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# Add the current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.counters import reconcile_counters
+from app.database import SessionLocal, engine
+from app.schema import upgrade_database
+
+
+def run_once(repair):
+    db = SessionLocal()
+    try:
+        drift = reconcile_counters(db, repair=repair)
+        db.commit()
+    finally:
+        db.close()
+
+    for name, rows in drift.items():
+        print(f"{'⚠️' if rows else '✅'} {name}: {rows} drifted rows{' repaired' if rows and repair else ''}")
+    return sum(drift.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recount and repair the denormalized counters")
+    parser.add_argument("--dry-run", action="store_true", help="report drift without repairing it")
+    parser.add_argument("--every", type=float, help="repeat every N seconds")
+    args = parser.parse_args()
+
+    upgrade_database(engine)
+
+    while True:
+        drifted = run_once(repair=not args.dry_run)
+        if not args.every:
+            break
+        time.sleep(args.every)
+
+    if args.dry_run and drifted:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Batch risk scoring: score every enrollment and store the results in the
+risk_scores table that the teacher analytics page reads from.
+
+    python score_risk.py                  # score all enrollments once
+    python score_risk.py --course 3       # score one course
+    python score_risk.py --every 3600     # keep re-scoring every hour
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# Add the current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.database import engine
+from app.schema import upgrade_database
+from app.risk_scoring import run_batch_scoring, RISK_SCORING_CHUNK_SIZE
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score all enrollments and persist risk scores")
+    parser.add_argument("--chunk-size", type=int, default=RISK_SCORING_CHUNK_SIZE)
+    parser.add_argument("--course", type=int, help="only score this course")
+    parser.add_argument("--every", type=float, help="repeat every N seconds")
+    args = parser.parse_args()
+
+    upgrade_database(engine)
+
+    while True:
+        run_batch_scoring(chunk_size=args.chunk_size, course_id=args.course)
+        if not args.every:
+            break
+        time.sleep(args.every)
+
+
+if __name__ == "__main__":
+    main()
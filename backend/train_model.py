@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Train the student performance model and publish it to the model registry.
+Run this script instead of training inside the API workers:
+
+    python train_model.py                      # train on synthetic data and make it current
+    python train_model.py --source database    # train on real attendance/grade history
+    python train_model.py --source database --incremental --add-trees 20
+                                               # grow the current forest on new data
+    python train_model.py --source database --window-days 365
+                                               # retrain on a sliding window
+    python train_model.py --no-promote         # train without switching CURRENT
+    python train_model.py --list               # list published versions and metrics
+"""
+
+import argparse
+import os
+import sys
+
+# Add the current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.database import SessionLocal, engine
+from app.schema import upgrade_database
+from app.model_registry import registry
+from app.ml_models import StudentPerformancePredictor
+from app.training import train_from_database, TRAINING_CHUNK_SIZE, TRAINING_MAX_ROWS
+
+
+def list_versions():
+    current = registry.current_version()
+    versions = registry.list_versions()
+    if not versions:
+        print("📌 No model versions published yet.")
+        return
+    print("📋 Published model versions:")
+    for version in versions:
+        manifest = registry.read_manifest(version)
+        marker = "*" if version == current else " "
+        print(f" {marker} {version}  {manifest.get('source', 'synthetic'):9} {manifest.get('mode', 'full'):11} "
+              f"trees={manifest.get('n_trees', '?'):>4}  accuracy={manifest.get('accuracy', 0):.3f}  "
+              f"auc={manifest.get('roc_auc', float('nan')):.3f}  "
+              f"train={manifest.get('training_seconds', float('nan')):.1f}s  created={manifest['created_at']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train and publish the student performance model")
+    parser.add_argument("--no-promote", action="store_true", help="publish without making it the current version")
+    parser.add_argument("--promote", metavar="VERSION", help="make an existing version current")
+    parser.add_argument("--list", action="store_true", help="list published versions")
+    parser.add_argument("--source", choices=["synthetic", "database"], default="synthetic")
+    parser.add_argument("--incremental", action="store_true", help="add trees to the current version (database only)")
+    parser.add_argument("--add-trees", type=int, default=20)
+    parser.add_argument("--n-estimators", type=int, default=100)
+    parser.add_argument("--window-days", type=int, help="only train on enrollments from the last N days")
+    parser.add_argument("--chunk-size", type=int, default=TRAINING_CHUNK_SIZE)
+    parser.add_argument("--max-rows", type=int, default=TRAINING_MAX_ROWS)
+    args = parser.parse_args()
+
+    if args.list:
+        list_versions()
+        return
+
+    if args.promote:
+        registry.set_current(args.promote)
+        print(f"✅ Version {args.promote} is now current")
+        return
+
+    if args.source == "database":
+        upgrade_database(engine)
+        db = SessionLocal()
+        try:
+            version = train_from_database(
+                db,
+                incremental=args.incremental,
+                add_trees=args.add_trees,
+                n_estimators=args.n_estimators,
+                chunk_size=args.chunk_size,
+                max_rows=args.max_rows,
+                window_days=args.window_days,
+                make_current=not args.no_promote
+            )
+        finally:
+            db.close()
+    else:
+        predictor = StudentPerformancePredictor()
+        predictor.train_model(make_current=not args.no_promote)
+        version = predictor.model_version
+
+    if version is None:
+        sys.exit(1)
+    print(f"✅ Published model version {version}")
+
+
+if __name__ == "__main__":
+    main()
@@ -12,7 +12,8 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from app.database import engine, SessionLocal
 from app import models
-from sqlalchemy import inspect
+from app.schema import upgrade_database
+from sqlalchemy import inspect, text
 
 def drop_all_tables():
     """Drop all existing tables (use with caution!)"""
@@ -24,13 +25,15 @@ def drop_all_tables():
     
     print("🗑️ Dropping all tables...")
     models.Base.metadata.drop_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE IF EXISTS alembic_version"))
     print("✅ All tables dropped successfully!")
     return True
 
 def create_all_tables():
-    """Create all tables fresh"""
+    """Create missing tables and apply pending migrations"""
     print("📊 Creating all tables...")
-    models.Base.metadata.create_all(bind=engine)
+    upgrade_database(engine)
     print("✅ All tables created successfully!")
 
 def verify_tables():